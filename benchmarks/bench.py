@@ -0,0 +1,269 @@
+"""The scheduler, runner and aiotools benchmarks.
+
+    python -m benchmarks.bench [--scale 1.0] [--repeat 3] [--out results.json]
+                               [--compare baseline.json] [--only name ...]
+
+Every scenario is built (the jobs are created and pushed) and run; the best
+of the timed repeats is reported, then one more run under tracemalloc gives
+the peak memory. The results are written as JSON, and with --compare the
+ratios against a previous result file are printed.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from time import monotonic, perf_counter, process_time, sleep
+from typing import Any, Callable
+
+from sprint2.aiotools import async_gather, async_sleep, async_wait, wait
+from sprint2.jobtools import Job, async_run_job
+from sprint2.scheduler import Scheduler
+
+
+__all__ = ["SCENARIOS", "Scenario", "main", "run_scenario"]
+
+
+class _Stamps:
+    """A job function recording when it has been called."""
+
+    def __init__(self, seconds: float = 0.0) -> None:
+        self.seconds = seconds
+        self.times: list[float] = []
+
+    def __call__(self, *args) -> None:
+        if self.seconds:
+            sleep(self.seconds)  # a blocking I/O stand-in
+        self.times.append(monotonic())
+
+
+@dataclass
+class Scenario:
+    name: str
+    jobs: int
+    # builds the workload and returns the callable running it
+    build: Callable[[_Stamps, int], Callable[[], Any]]
+    ideal: float = 0.0  # the wall time of a scheduler without any overhead
+    seconds: float = 0.0  # how long a job blocks
+    calls: bool = True  # whether the jobs are run, not only created
+
+
+def _sched_runner(sched: Scheduler) -> Callable[[], Any]:
+    def _run() -> Any:
+        try:
+            return sched.run()
+        finally:
+            sched.shutdown()
+
+    return _run
+
+
+def _independent(stamps: _Stamps, n: int) -> Callable[[], Any]:
+    sched = Scheduler(pool_size=10)
+    for num in range(n):
+        sched.push(Job(fn=stamps, args=[num]))
+    return _sched_runner(sched)
+
+
+def _mapped(stamps: _Stamps, n: int) -> Callable[[], Any]:
+    sched = Scheduler(pool_size=10)
+    results = sched.map(stamps, ((num,) for num in range(n)), chunksize=100)
+
+    def _run() -> Any:
+        try:
+            return list(results)
+        finally:
+            sched.shutdown()
+
+    return _run
+
+
+def _fan_in(stamps: _Stamps, n: int) -> Callable[[], Any]:
+    sched = Scheduler(pool_size=10)
+    leaves = [Job(fn=stamps, args=[num]) for num in range(n - 1)]
+    sched.push(Job(fn=stamps, args=["root"], dependencies=leaves))
+    return _sched_runner(sched)
+
+
+def _deep_chain(stamps: _Stamps, n: int) -> Callable[[], Any]:
+    sched = Scheduler(pool_size=10)
+    job = Job(fn=stamps, args=[0])
+    for num in range(1, n):
+        job = Job(fn=stamps, args=[num], dependencies=[job])
+    sched.push(job)
+    return _sched_runner(sched)
+
+
+_START_DELAY = 0.2
+
+
+def _sleeping(stamps: _Stamps, n: int) -> Callable[[], Any]:
+    sched = Scheduler(pool_size=n)
+    start = datetime.now() + timedelta(seconds=_START_DELAY)
+    for num in range(n):
+        sched.push(Job(fn=stamps, args=[num], start=start))
+    return _sched_runner(sched)
+
+
+_IO_POOL = 20
+
+
+def _blocking_io(stamps: _Stamps, n: int) -> Callable[[], Any]:
+    sched = Scheduler(pool_size=_IO_POOL)
+    for num in range(n):
+        sched.push(Job(fn=stamps, args=[num], executor="thread"))
+    return _sched_runner(sched)
+
+
+def _run_jobs(stamps: _Stamps, n: int) -> Callable[[], Any]:
+    jobs = [Job(fn=stamps, args=[num]) for num in range(n)]
+    return lambda: wait(*[async_run_job(job) for job in jobs])
+
+
+def _create(stamps: _Stamps, n: int) -> Callable[[], Any]:
+    return lambda: [Job(fn=stamps, args=[num]) for num in range(n)]
+
+
+def _create_bulk(stamps: _Stamps, n: int) -> Callable[[], Any]:
+    return lambda: Job.bulk(stamps, ([num] for num in range(n)))
+
+
+def _noop(stamps: _Stamps) -> Any:
+    yield from async_sleep(0)
+    stamps()
+
+
+def _gather(stamps: _Stamps, n: int) -> Callable[[], Any]:
+    return lambda: wait(async_gather(*[_noop(stamps) for _ in range(n)]))
+
+
+def _wait(stamps: _Stamps, n: int) -> Callable[[], Any]:
+    return lambda: wait(async_wait(*[_noop(stamps) for _ in range(n)]))
+
+
+SCENARIOS = [
+    Scenario("sched_independent_noop", 10_000, _independent),
+    Scenario("sched_map_chunked", 10_000, _mapped),
+    Scenario("sched_fan_in", 2_000, _fan_in),
+    Scenario("sched_deep_chain", 2_000, _deep_chain),
+    Scenario("sched_sleeping_start", 1_000, _sleeping, ideal=_START_DELAY),
+    Scenario("sched_blocking_io", 400, _blocking_io, seconds=0.01),
+    Scenario("run_job_noop", 10_000, _run_jobs),
+    Scenario("gather_noop", 10_000, _gather),
+    Scenario("wait_noop", 10_000, _wait),
+    Scenario("job_create", 100_000, _create, calls=False),
+    Scenario("job_create_bulk", 100_000, _create_bulk, calls=False),
+]
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def _measure(scenario: Scenario, n: int) -> dict[str, float]:
+    stamps = _Stamps(scenario.seconds)
+    setup_start = perf_counter()
+    run = scenario.build(stamps, n)
+    setup = perf_counter() - setup_start
+    t0, cpu_start, wall_start = monotonic(), process_time(), perf_counter()
+    jobs = run()  # kept alive for the memory peak
+    wall = perf_counter() - wall_start
+    cpu = process_time() - cpu_start
+    latencies = [t - t0 for t in stamps.times]
+    del jobs
+    if scenario.calls and len(latencies) != n:
+        msg = f"{scenario.name}: {len(latencies)} of {n} jobs have run"
+        raise RuntimeError(msg)
+    ideal = scenario.ideal
+    if scenario.seconds:  # the blocking jobs run in waves of the pool size
+        ideal = -(-n // _IO_POOL) * scenario.seconds
+    return {
+        "setup_s": setup,
+        "wall_s": wall,
+        "jobs_per_s": n / wall,
+        "overhead_per_job_us": max(wall - ideal, 0.0) / n * 1e6,
+        "latency_p50_ms": _percentile(latencies, 0.5) * 1e3,
+        "latency_p99_ms": _percentile(latencies, 0.99) * 1e3,
+        "cpu_s": cpu,
+        "cpu_per_wall": cpu / wall,
+    }
+
+
+def run_scenario(scenario: Scenario, scale: float = 1.0, repeat: int = 3) -> dict:
+    n = max(int(scenario.jobs * scale), 2)
+    runs = [_measure(scenario, n) for _ in range(max(repeat, 1))]
+    best = min(runs, key=lambda r: r["wall_s"])
+    tracemalloc.start()
+    try:
+        _measure(scenario, n)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "name": scenario.name,
+        "jobs": n,
+        **best,
+        "peak_mem_kb": peak / 1024,
+        "peak_mem_per_job_b": peak / n,
+    }
+
+
+def _compare(results: list[dict], path: str) -> None:
+    with open(path, encoding="utf-8") as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    print(f"{'scenario':<26}{'jobs/s':>12}{'p99':>10}{'peak mem':>10}")
+    for res in results:
+        if (base := baseline.get(res["name"])) is None:
+            continue
+        ratios = [
+            res[key] / base[key] if base[key] else float("nan")
+            for key in ("jobs_per_s", "latency_p99_ms", "peak_mem_kb")
+        ]
+        print(f"{res['name']:<26}" + "".join(f"{r:>10.2f}x" for r in ratios))
+
+
+def main(argv: None | list[str] = None) -> list[dict]:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="the JSON file for the results")
+    parser.add_argument("--compare", help="a JSON result file to compare with")
+    parser.add_argument("--only", nargs="*", help="the scenarios to run")
+    args = parser.parse_args(argv)
+
+    scenarios = [s for s in SCENARIOS if not args.only or s.name in args.only]
+    results = []
+    for scenario in scenarios:
+        res = run_scenario(scenario, scale=args.scale, repeat=args.repeat)
+        print(
+            f"{res['name']:<26}{res['jobs']:>7} jobs {res['jobs_per_s']:>10.0f}/s"
+            f" p99 {res['latency_p99_ms']:>8.2f} ms cpu/wall"
+            f" {res['cpu_per_wall']:.2f} peak {res['peak_mem_kb']:>8.0f} KiB"
+        )
+        results.append(res)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        _compare(results, args.compare)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,26 @@
-from sprint2.aiotools.coro import Coroutine, coroutine  # noqa: F401
+from sprint2.aiotools.completed import as_completed  # noqa: F401
+from sprint2.aiotools.coro import Awaitable, Coroutine, coroutine  # noqa: F401
+from sprint2.aiotools.files import (  # noqa: F401
+    ChunkReader,
+    ChunkWriter,
+    MmapReader,
+    async_copy_file,
+    async_process_file,
+)
+from sprint2.aiotools.futures import async_result  # noqa: F401
 from sprint2.aiotools.gather import async_gather, gather  # noqa: F401
+from sprint2.aiotools.http import ConnectionPool, HTTPError, Response  # noqa: F401
+from sprint2.aiotools.io import (  # noqa: F401
+    async_accept,
+    async_connect,
+    async_recv,
+    async_send,
+    async_sendall,
+    wait_readable,
+    wait_writable,
+)
+from sprint2.aiotools.loop import Loop, Task, run_until_complete  # noqa: F401
 from sprint2.aiotools.sleep import async_sleep  # noqa: F401
+from sprint2.aiotools.timers import TimerHeap  # noqa: F401
+from sprint2.aiotools.traps import Poll, Sleep, Wait  # noqa: F401
 from sprint2.aiotools.wait import async_wait, wait  # noqa: F401
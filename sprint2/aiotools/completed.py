@@ -0,0 +1,23 @@
+from typing import Any, Iterator
+
+from sprint2.aiotools.loop import Loop
+
+
+__all__ = ["as_completed"]
+
+
+def as_completed(*aws) -> Iterator[tuple[Any, Any]]:
+    """Run the coroutines, yield (coroutine, result or exception) as they end.
+
+    A finished coroutine is forgotten once it is yielded.
+    """
+
+    loop = Loop()
+    tasks = {loop.spawn(aw): aw for aw in aws}
+    try:
+        while loop:
+            for task in loop.run_ready():
+                yield tasks.pop(task), task.res if task.exc is None else task.exc
+            loop.park()
+    finally:
+        loop.close()
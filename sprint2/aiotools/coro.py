@@ -1,9 +1,22 @@
 from functools import wraps
 from inspect import isgeneratorfunction
-from typing import Any, Callable, Generator
+from typing import Any, Callable, Generator, ParamSpec, Protocol
 
 
-__all__ = ["Coroutine", "coroutine"]
+__all__ = ["Awaitable", "Coroutine", "coroutine"]
+
+
+P = ParamSpec("P")
+
+
+class Awaitable(Protocol):
+    """What a loop steps: a generator or a Coroutine."""
+
+    def __next__(self) -> Any: ...
+
+    def throw(self, exc: BaseException, /) -> Any: ...
+
+    def close(self) -> None: ...
 
 
 def validate_generator_function(gen_func: Callable) -> None:
@@ -21,13 +34,16 @@ class Coroutine:
     def __next__(self) -> Any:
         return next(self._gen)
 
+    def throw(self, exc: BaseException) -> Any:
+        return self._gen.throw(exc)
+
     def close(self) -> None:
         self._gen.close()
 
 
-def coroutine(gen_func: Callable) -> Callable[[Any], Any]:
+def coroutine(gen_func: Callable[P, Generator]) -> Callable[P, Coroutine]:
     @wraps(gen_func)
-    def _wrapper(*args, **kwargs) -> Coroutine:
+    def _wrapper(*args: P.args, **kwargs: P.kwargs) -> Coroutine:
         return Coroutine(gen_func, *args, **kwargs)
 
     return _wrapper
@@ -0,0 +1,184 @@
+import mmap
+import os
+from abc import ABC, abstractmethod
+from io import RawIOBase
+from typing import IO, Any, Callable, Generator, cast
+
+
+__all__ = [
+    "ChunkReader",
+    "ChunkWriter",
+    "MmapReader",
+    "async_copy_file",
+    "async_process_file",
+]
+
+
+_CHUNK_SIZE = 1 << 20
+
+# a path, or a binary file object left open on close()
+_File = str | os.PathLike | IO[bytes]
+
+
+def _open(file: _File, mode: str) -> tuple[IO[bytes], bool]:
+    """Return the file object and whether we own it."""
+
+    if isinstance(file, (str, os.PathLike)):
+        # unbuffered, the chunks are our buffers
+        return open(file, mode, buffering=0), True
+    return file, False
+
+
+def _validate_chunk_size(chunk_size: int) -> int:
+    if chunk_size < 1:
+        msg = f"the chunk size must be positive, got {chunk_size}"
+        raise ValueError(msg)
+    return chunk_size
+
+
+# the file calls do not wait for readiness, a disk file is always ready;
+# instead every chunk is a loop step, so the other tasks run in between
+
+
+class _Closing(ABC):
+    def __enter__(self) -> Any:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @abstractmethod
+    def close(self) -> None: ...
+
+
+class ChunkReader(_Closing):
+    """Reads a file chunk by chunk into one reused buffer.
+
+    A chunk is a view of the buffer, valid until the next read.
+    """
+
+    def __init__(self, file: _File, chunk_size: int = _CHUNK_SIZE) -> None:
+        self._buffer = memoryview(bytearray(_validate_chunk_size(chunk_size)))
+        self._file, self._owned = _open(file, "rb")
+
+    def async_read_chunk(self) -> Generator[None, None, memoryview]:
+        """Return the next chunk, an empty one at the end of the file."""
+
+        yield
+        read = 0
+        readinto = cast(RawIOBase, self._file).readinto  # IO does not declare it
+        # a raw file may return less than asked before the end
+        while read < len(self._buffer):
+            if not (num := readinto(self._buffer[read:])):
+                break
+            read += num
+        return self._buffer[:read]
+
+    def close(self) -> None:
+        if self._owned:
+            self._file.close()
+
+
+class MmapReader(_Closing):
+    """Reads a file by chunks of its memory map, without copying.
+
+    A chunk is a view of the map, valid until the next read; the pages are
+    read in by the OS on the first access.
+    """
+
+    def __init__(self, file: _File, chunk_size: int = _CHUNK_SIZE) -> None:
+        self._chunk_size = _validate_chunk_size(chunk_size)
+        self._file, self._owned = _open(file, "rb")
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._map = None
+        if self._size:  # an empty file cannot be mapped
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self._map, "madvise"):
+                self._map.madvise(mmap.MADV_SEQUENTIAL)
+        self._view = memoryview(self._map or b"")
+        self._pos = 0
+        self._chunk: None | memoryview = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def async_read_chunk(self) -> Generator[None, None, memoryview]:
+        yield
+        self._release_chunk()
+        chunk = self._view[self._pos : self._pos + self._chunk_size]
+        self._pos += len(chunk)
+        self._chunk = chunk
+        return chunk
+
+    def close(self) -> None:
+        self._release_chunk()
+        self._view.release()
+        if self._map is not None:
+            self._map.close()  # BufferError if a chunk view is still kept
+        if self._owned:
+            self._file.close()
+
+    def _release_chunk(self) -> None:
+        # the map cannot be closed while a view of it is alive
+        if self._chunk is not None:
+            self._chunk.release()
+            self._chunk = None
+
+
+class ChunkWriter(_Closing):
+    """Writes the data to a file chunk by chunk."""
+
+    def __init__(
+        self, file: _File, chunk_size: int = _CHUNK_SIZE, append: bool = False
+    ) -> None:
+        self._chunk_size = _validate_chunk_size(chunk_size)
+        self._file, self._owned = _open(file, "ab" if append else "wb")
+
+    def async_write(self, data: Any) -> Generator[None, None, int]:
+        """Write the bytes-like data, return the number of the bytes."""
+
+        view = memoryview(data).cast("B")
+        for start in range(0, len(view), self._chunk_size):
+            yield
+            chunk = view[start : start + self._chunk_size]
+            while chunk:  # a raw file may write less than given
+                chunk = chunk[self._file.write(chunk) :]
+        return len(view)
+
+    def close(self) -> None:
+        self._file.flush()
+        if self._owned:
+            self._file.close()
+
+
+def async_process_file(
+    file: _File,
+    fn: Callable[[memoryview], Any],
+    chunk_size: int = _CHUNK_SIZE,
+    use_mmap: bool = False,
+) -> Generator[None, None, int]:
+    """Call `fn` on every chunk of the file, return the size of the file.
+
+    The memory used is one chunk however big the file is, or none with
+    `use_mmap`; the chunk given to `fn` is not valid after the call.
+    """
+
+    reader_cls = MmapReader if use_mmap else ChunkReader
+    size = 0
+    with reader_cls(file, chunk_size) as reader:
+        while chunk := (yield from reader.async_read_chunk()):
+            fn(chunk)
+            size += len(chunk)
+    return size
+
+
+def async_copy_file(
+    src: _File, dst: _File, chunk_size: int = _CHUNK_SIZE
+) -> Generator[None, None, int]:
+    """Copy the file through one reused buffer, return the number of bytes."""
+
+    size = 0
+    with ChunkReader(src, chunk_size) as reader, ChunkWriter(dst, chunk_size) as writer:
+        while chunk := (yield from reader.async_read_chunk()):
+            size += yield from writer.async_write(chunk)
+    return size
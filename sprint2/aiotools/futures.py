@@ -0,0 +1,20 @@
+from concurrent.futures import Future
+from typing import Any, Generator
+
+from sprint2.aiotools.timers import monotonic
+from sprint2.aiotools.traps import Wait
+
+
+__all__ = ["async_result"]
+
+
+def async_result(
+    future: Future, timeout: None | float = None
+) -> Generator[Wait, None, Any]:
+    ddl = monotonic() + timeout if timeout is not None else None
+    while not future.done():
+        if ddl is not None and monotonic() >= ddl:
+            msg = f"the timeout ({timeout} s) is exceeded"
+            raise TimeoutError(msg)
+        yield Wait(future, ddl)
+    return future.result()
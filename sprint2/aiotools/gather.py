@@ -1,37 +1,25 @@
-from collections import deque
-from dataclasses import dataclass
-from typing import Any, Generator, Iterator
+from typing import Any, Generator
 
+from sprint2.aiotools.loop import Loop
 from sprint2.aiotools.wait import wait
 
 
 __all__ = ["async_gather", "gather"]
 
 
-@dataclass
-class _NAW:
-    num: int
-    aw: Iterator
-    res: Any = None
-
-
 def async_gather(*aws, return_exceptions: bool = False) -> Generator[Any, None, Any]:
-    coros = deque([_NAW(num=num, aw=aw) for num, aw in enumerate(aws)])
-    results: list[_NAW] = []
-    while coros:
-        coro = coros.popleft()
-        try:
-            yield next(coro.aw)
-            coros.append(coro)
-        except StopIteration as r:
-            coro.res = r.value
-            results.append(coro)
-        except Exception as exc:
-            if not return_exceptions:
-                raise exc
-            coro.res = exc
-            results.append(coro)
-    return [naw.res for naw in sorted(results, key=lambda _naw: _naw.num)]
+    loop = Loop()
+    tasks = [loop.spawn(aw) for aw in aws]
+    try:
+        while loop:
+            for task in loop.run_ready():
+                if task.exc is not None and not return_exceptions:
+                    raise task.exc
+            if loop:
+                yield loop.idle_request()
+    finally:
+        loop.close()
+    return [task.res if task.exc is None else task.exc for task in tasks]
 
 
 def gather(*aws, return_exceptions: bool = False) -> list:
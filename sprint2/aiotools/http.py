@@ -0,0 +1,365 @@
+import socket
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any, Generator, Mapping
+from urllib.parse import urlsplit
+
+from sprint2.aiotools.futures import async_result
+from sprint2.aiotools.io import async_connect, async_recv, async_sendall
+from sprint2.aiotools.timers import monotonic
+
+
+__all__ = ["ConnectionPool", "HTTPError", "Response"]
+
+
+_RECV_SIZE = 65536
+_MAX_LINE = 65536  # a longer status, header or chunk size line is an error
+_MAX_HEADERS = 100
+
+
+class HTTPError(Exception):
+    pass
+
+
+class _Connection:
+    __slots__ = ("sock", "host", "buffer", "reused", "idle_since")
+
+    def __init__(self, sock: socket.socket, host: tuple[str, int]) -> None:
+        self.sock = sock
+        self.host = host
+        self.buffer = bytearray()  # received and not consumed yet
+        self.reused = False
+        self.idle_since = 0.0
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def read_some(
+        self, size: int, timeout: None | float
+    ) -> Generator[Any, None, bytes]:
+        """Return up to `size` bytes, b"" when the server has closed."""
+
+        if not self.buffer:
+            data = yield from async_recv(self.sock, _RECV_SIZE, timeout)
+            if len(data) <= size:
+                return data
+            self.buffer += data
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def read_line(self, timeout: None | float) -> Generator[Any, None, bytes]:
+        buffer = self.buffer
+        start = 0
+        while (end := buffer.find(b"\n", start)) < 0:
+            if len(buffer) > _MAX_LINE:
+                msg = f"a line is longer than {_MAX_LINE} bytes"
+                raise HTTPError(msg)
+            start = len(buffer)
+            if not (data := (yield from async_recv(self.sock, _RECV_SIZE, timeout))):
+                msg = "the connection is closed in the middle of a line"
+                raise HTTPError(msg)
+            buffer += data
+        line = bytes(buffer[: end + 1])
+        del buffer[: end + 1]
+        return line
+
+
+class Response:
+    """A response with the body not read yet, it is streamed in chunks.
+
+    The connection goes back to the pool once the body is read to the end;
+    close() a response left unread, it also frees the per-host slot.
+    """
+
+    def __init__(
+        self,
+        pool: "ConnectionPool",
+        conn: _Connection,
+        status: int,
+        reason: str,
+        headers: dict[str, str],
+        keep_alive: bool,
+        timeout: None | float,
+    ) -> None:
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._pool = pool
+        self._conn: None | _Connection = conn
+        self._keep_alive = keep_alive
+        self._timeout = timeout
+        self._chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+        self._chunk_left = 0
+        # the bytes left of a Content-Length body, None until the close
+        self._remaining: None | int = None
+        if not self._chunked and "content-length" in headers:
+            try:
+                self._remaining = int(headers["content-length"])
+            except ValueError as e:
+                raise HTTPError(str(e)) from e
+        if status in (204, 304) or 100 <= status < 200:
+            self._remaining = 0
+        if self._remaining is None and not self._chunked:
+            self._keep_alive = False  # the body ends with the connection
+        if self._remaining == 0:
+            self._finish()
+
+    def __enter__(self) -> "Response":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.status} {self.reason}>"
+
+    @property
+    def done(self) -> bool:
+        return self._conn is None
+
+    def async_read_chunk(self, size: int = _RECV_SIZE) -> Generator[Any, None, bytes]:
+        """Return the next part of the body of up to `size` bytes, b"" at the end."""
+
+        if (conn := self._conn) is None:
+            return b""
+        timeout = self._timeout
+        if self._chunked:
+            if not self._chunk_left:
+                line = yield from conn.read_line(timeout)
+                try:
+                    self._chunk_left = int(line.split(b";")[0], 16)
+                except ValueError as e:
+                    raise HTTPError(f"a bad chunk size {line!r}") from e
+                if not self._chunk_left:
+                    while (yield from conn.read_line(timeout)).strip():
+                        pass  # the trailers
+                    self._finish()
+                    return b""
+            data = yield from conn.read_some(min(size, self._chunk_left), timeout)
+            if not data:
+                raise HTTPError("the connection is closed in the middle of a chunk")
+            self._chunk_left -= len(data)
+            if not self._chunk_left:
+                yield from conn.read_line(timeout)  # the CRLF after the chunk
+            return data
+        if self._remaining is None:
+            if not (data := (yield from conn.read_some(size, timeout))):
+                self._finish()
+            return data
+        data = yield from conn.read_some(min(size, self._remaining), timeout)
+        if not data:
+            raise HTTPError(f"the connection is closed, {self._remaining} bytes short")
+        self._remaining -= len(data)
+        if not self._remaining:
+            self._finish()
+        return data
+
+    def async_read(self, limit: None | int = None) -> Generator[Any, None, bytes]:
+        """Return the whole body, a body over `limit` bytes is an error."""
+
+        body = bytearray()
+        while data := (yield from self.async_read_chunk()):
+            body += data
+            if limit is not None and len(body) > limit:
+                self.close()
+                raise HTTPError(f"the body is over {limit} bytes")
+        return bytes(body)
+
+    def close(self) -> None:
+        """Drop the connection unless the body has been read to the end."""
+
+        if (conn := self._conn) is not None:
+            self._conn = None
+            conn.close()
+            self._pool._release(conn.host, None)
+
+    def _finish(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool._release(conn.host, conn if self._keep_alive else None)
+
+
+class ConnectionPool:
+    """An HTTP/1.1 GET client keeping the connections alive between requests.
+
+    At most `max_per_host` requests to a host are in flight at once, the
+    next ones wait for a free slot; up to `max_idle` idle connections are
+    kept, each for `idle_timeout` seconds. The `timeout` is for every
+    connect, send and receive. Only plain http is supported, the host name
+    is resolved by a blocking call.
+    """
+
+    def __init__(
+        self,
+        max_per_host: int = 4,
+        max_idle: int = 32,
+        timeout: None | float = 30.0,
+        idle_timeout: float = 30.0,
+    ) -> None:
+        if max_per_host < 1:
+            msg = f"max_per_host must be positive, got {max_per_host}"
+            raise ValueError(msg)
+        self.max_per_host = max_per_host
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._idle: defaultdict[tuple[str, int], list[_Connection]] = defaultdict(list)
+        self._num_idle = 0
+        self._active: defaultdict[tuple[str, int], int] = defaultdict(int)
+        self._waiters: defaultdict[tuple[str, int], deque[Future]] = defaultdict(deque)
+        self._lock = Lock()
+
+    def async_get(
+        self,
+        url: str,
+        headers: None | Mapping[str, str] = None,
+        timeout: None | float = None,
+    ) -> Generator[Any, None, Response]:
+        """Send a GET request and return the response once its headers are in."""
+
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            msg = f"only http URLs are supported, got {url!r}"
+            raise HTTPError(msg)
+        host = (parts.hostname, parts.port or 80)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        lines = [f"GET {target} HTTP/1.1", f"Host: {parts.netloc}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        if timeout is None:
+            timeout = self.timeout
+
+        conn = yield from self._acquire(host, timeout)
+        try:
+            while True:
+                try:
+                    yield from async_sendall(conn.sock, request, timeout)
+                    return (yield from self._read_head(conn, timeout))
+                except (HTTPError, ConnectionError):
+                    if not conn.reused or conn.buffer:
+                        raise
+                    # the server has closed the idle connection, a new one
+                    conn.close()
+                    conn = yield from self._connect(host, timeout)
+        except BaseException:
+            conn.close()
+            self._release(host, None)
+            raise
+
+    def close(self) -> None:
+        """Close the idle connections."""
+
+        with self._lock:
+            idle = [conn for conns in self._idle.values() for conn in conns]
+            self._idle.clear()
+            self._num_idle = 0
+        for conn in idle:
+            conn.close()
+
+    def _acquire(
+        self, host: tuple[str, int], timeout: None | float
+    ) -> Generator[Any, None, _Connection]:
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            with self._lock:
+                if self._active[host] < self.max_per_host:
+                    self._active[host] += 1
+                    conn = self._pop_idle(host)
+                    break
+                waiter: Future = Future()
+                self._waiters[host].append(waiter)
+            try:
+                remaining = None if deadline is None else deadline - monotonic()
+                yield from async_result(waiter, remaining)
+            except BaseException:
+                with self._lock:
+                    if not waiter.cancel():  # woken up, the next one tries
+                        self._wake_next(host)
+                raise
+        if conn is not None:
+            return conn
+        try:
+            return (yield from self._connect(host, timeout))
+        except BaseException:
+            self._release(host, None)
+            raise
+
+    def _connect(
+        self, host: tuple[str, int], timeout: None | float
+    ) -> Generator[Any, None, _Connection]:
+        sock = socket.socket()
+        try:
+            yield from async_connect(sock, host, timeout)
+        except BaseException:
+            sock.close()
+            raise
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return _Connection(sock, host)
+
+    def _pop_idle(self, host: tuple[str, int]) -> None | _Connection:
+        # under the lock, the most recently used first
+        idle, stale = self._idle[host], monotonic() - self.idle_timeout
+        while idle:
+            conn = idle.pop()
+            self._num_idle -= 1
+            if conn.idle_since > stale:
+                conn.reused = True
+                return conn
+            conn.close()
+        return None
+
+    def _release(self, host: tuple[str, int], conn: None | _Connection) -> None:
+        """Free the slot of the host, keep the connection if it is given."""
+
+        with self._lock:
+            self._active[host] -= 1
+            if conn is not None and self._num_idle < self.max_idle:
+                conn.idle_since = monotonic()
+                self._idle[host].append(conn)
+                self._num_idle += 1
+                conn = None
+            self._wake_next(host)
+        if conn is not None:
+            conn.close()
+
+    def _wake_next(self, host: tuple[str, int]) -> None:
+        # under the lock, the woken waiter competes for the free slot again
+        waiters = self._waiters[host]
+        while waiters:
+            if not (waiter := waiters.popleft()).cancelled():
+                waiter.set_result(None)
+                break
+
+    def _read_head(
+        self, conn: _Connection, timeout: None | float
+    ) -> Generator[Any, None, Response]:
+        while True:
+            line = yield from conn.read_line(timeout)
+            try:
+                version, status, *reason = line.decode("latin-1").split(None, 2)
+                code = int(status)
+            except ValueError as e:
+                raise HTTPError(f"a bad status line {line!r}") from e
+            headers: dict[str, str] = {}
+            while (line := (yield from conn.read_line(timeout))).strip():
+                if len(headers) >= _MAX_HEADERS:
+                    raise HTTPError(f"more than {_MAX_HEADERS} headers")
+                name, _, value = line.decode("latin-1").partition(":")
+                name, value = name.strip().lower(), value.strip()
+                headers[name] = (
+                    f"{headers[name]}, {value}" if name in headers else value
+                )
+            if code != 100:  # an interim response before the real one
+                break
+        connection = headers.get("connection", "").lower()
+        keep_alive = (
+            "keep-alive" in connection
+            if version == "HTTP/1.0"
+            else "close" not in connection
+        )
+        reason_text = reason[0].strip() if reason else ""
+        return Response(self, conn, code, reason_text, headers, keep_alive, timeout)
@@ -0,0 +1,122 @@
+import errno
+import os
+import selectors
+import socket
+from typing import Any, Generator
+
+from sprint2.aiotools.timers import monotonic
+from sprint2.aiotools.traps import Poll
+
+
+__all__ = [
+    "async_accept",
+    "async_connect",
+    "async_recv",
+    "async_send",
+    "async_sendall",
+    "wait_readable",
+    "wait_writable",
+]
+
+
+_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, errno.EAGAIN}
+
+
+def _deadline(timeout: None | float) -> None | float:
+    return None if timeout is None else monotonic() + timeout
+
+
+def _wait_ready(
+    fileobj: Any, events: int, deadline: None | float
+) -> Generator[Poll, None, None]:
+    yield Poll(fileobj, events, deadline)
+    # the loop resumes us on the readiness or on the deadline
+    if deadline is not None and monotonic() >= deadline:
+        msg = "the file is not ready in time"
+        raise TimeoutError(msg)
+
+
+def wait_readable(
+    fileobj: Any, timeout: None | float = None
+) -> Generator[Poll, None, None]:
+    """Wait until the file descriptor (or an object with fileno()) is readable."""
+
+    yield from _wait_ready(fileobj, selectors.EVENT_READ, _deadline(timeout))
+
+
+def wait_writable(
+    fileobj: Any, timeout: None | float = None
+) -> Generator[Poll, None, None]:
+    yield from _wait_ready(fileobj, selectors.EVENT_WRITE, _deadline(timeout))
+
+
+# the socket calls below switch the socket to the non-blocking mode
+
+
+def async_connect(
+    sock: socket.socket, address: Any, timeout: None | float = None
+) -> Generator[Poll, None, None]:
+    sock.setblocking(False)
+    if (err := sock.connect_ex(address)) in _IN_PROGRESS:
+        yield from _wait_ready(sock, selectors.EVENT_WRITE, _deadline(timeout))
+        err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+    if err:
+        raise OSError(err, os.strerror(err))
+
+
+def async_accept(
+    sock: socket.socket, timeout: None | float = None
+) -> Generator[Poll, None, tuple[socket.socket, Any]]:
+    """Accept a connection, the new socket is non-blocking too."""
+
+    sock.setblocking(False)
+    deadline = _deadline(timeout)
+    while True:
+        try:
+            conn, address = sock.accept()
+        except (BlockingIOError, InterruptedError):
+            yield from _wait_ready(sock, selectors.EVENT_READ, deadline)
+        else:
+            conn.setblocking(False)
+            return conn, address
+
+
+def async_recv(
+    sock: socket.socket, bufsize: int, timeout: None | float = None
+) -> Generator[Poll, None, bytes]:
+    """Receive up to `bufsize` bytes, b"" when the peer has closed."""
+
+    sock.setblocking(False)
+    deadline = _deadline(timeout)
+    while True:
+        try:
+            return sock.recv(bufsize)
+        except (BlockingIOError, InterruptedError):
+            yield from _wait_ready(sock, selectors.EVENT_READ, deadline)
+
+
+def async_send(
+    sock: socket.socket, data: bytes | memoryview, timeout: None | float = None
+) -> Generator[Poll, None, int]:
+    """Send a part of the data, return how many bytes are sent."""
+
+    sock.setblocking(False)
+    deadline = _deadline(timeout)
+    while True:
+        try:
+            return sock.send(data)
+        except (BlockingIOError, InterruptedError):
+            yield from _wait_ready(sock, selectors.EVENT_WRITE, deadline)
+
+
+def async_sendall(
+    sock: socket.socket, data: bytes, timeout: None | float = None
+) -> Generator[Poll, None, None]:
+    """Send all of the data, the timeout is for the whole of it."""
+
+    deadline = _deadline(timeout)
+    view = memoryview(data)
+    while view:
+        remaining = None if deadline is None else max(deadline - monotonic(), 0)
+        sent = yield from async_send(sock, view, timeout=remaining)
+        view = view[sent:]
@@ -0,0 +1,318 @@
+import selectors
+import socket
+from collections import deque
+from concurrent.futures import Future
+from itertools import count
+from threading import Condition
+from typing import Any
+
+from sprint2.aiotools.coro import Awaitable
+from sprint2.aiotools.timers import TimerHeap, monotonic
+from sprint2.aiotools.traps import Poll, Sleep, Wait
+
+
+__all__ = ["Loop", "Task", "run_until_complete"]
+
+
+_POLL_INTERVAL = 0.005  # for an outer driver when the selector has no fd
+
+
+class Task:
+    def __init__(self, aw: Awaitable) -> None:
+        self.aw = aw
+        self.done = False
+        self.res: Any = None
+        self.exc: None | Exception = None
+
+    def result(self) -> Any:
+        if self.exc is not None:
+            raise self.exc
+        return self.res
+
+
+class Loop:
+    """Drives coroutines by the traps they yield.
+
+    Runnable tasks sit in the ready queue, sleeping ones in the timer heap and
+    the ones waiting for a future in the parked table, so a step only costs
+    as much as there are ready tasks.
+
+    The tasks waiting for a file to become readable or writable are
+    registered in a selector, created on the first such wait. While there
+    are some, the idle loop blocks in select() with the timeout of the next
+    timer, and notify() wakes it through a socket pair.
+    """
+
+    def __init__(self) -> None:
+        self._ready: deque[Task] = deque()
+        self._timers: TimerHeap[tuple[Task, int]] = TimerHeap()
+        # task -> token of its current wait, stale wakeups carry old tokens
+        self._parked: dict[Task, int] = {}
+        self._tokens = count()
+        self._cond = Condition()
+        self._woken: deque[tuple[Task, int]] = deque()
+        self._notified = False
+        self._wakeup: None | Future = None
+        self._pending = 0
+        self._thrown: dict[Task, Exception] = {}  # task -> exception to throw
+        self._selector: None | selectors.BaseSelector = None
+        self._waker: None | tuple[socket.socket, socket.socket] = None
+        self._polling: dict[Task, tuple[Any, int]] = {}  # task -> (file, event)
+        self._selecting = False  # blocked in select(), notify() must write
+
+    def __len__(self) -> int:
+        return self._pending
+
+    def spawn(self, aw: Awaitable) -> Task:
+        task = Task(aw)
+        self._pending += 1
+        self._ready.append(task)
+        return task
+
+    def cancel(self, task: Task, exc: Exception) -> None:
+        """Throw the exception into the task at its next step.
+
+        A parked task is made ready at once, its pending wakeups go stale.
+        """
+
+        if task.done:
+            return
+        self._thrown[task] = exc
+        if self._parked.pop(task, None) is not None:
+            self._unpoll(task)
+            self._ready.append(task)
+
+    def close(self) -> None:
+        """Release the selector, if any; the loop may still run without I/O."""
+
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+        if self._waker is not None:
+            for sock in self._waker:
+                sock.close()
+            self._waker = None
+        self._polling.clear()
+
+    def notify(self) -> None:
+        """Wake the loop up, safe to call from any thread."""
+
+        with self._cond:
+            self._notified = True
+            self._cond.notify()
+            wakeup, self._wakeup = self._wakeup, None
+            waker = self._waker if self._selecting else None
+        if wakeup is not None:
+            wakeup.set_result(None)
+        if waker is not None:
+            try:
+                waker[1].send(b"\0")
+            except OSError:  # full, a wakeup is pending anyway, or closed
+                pass
+
+    def _wake(self, task: Task, token: int) -> None:
+        self._woken.append((task, token))
+        self.notify()
+
+    def _resume(self, task: Task, token: int) -> None:
+        if self._parked.get(task) == token:
+            del self._parked[task]
+            if self._polling:
+                self._unpoll(task)
+            self._ready.append(task)
+
+    def _poll(self) -> None:
+        if self._polling or self._selecting:
+            self._select(0)
+        for task, token in self._timers.pop_due():
+            self._resume(task, token)
+        woken = self._woken
+        while woken:
+            self._resume(*woken.popleft())
+
+    def _get_selector(self) -> selectors.BaseSelector:
+        if self._selector is None:
+            self._selector = selectors.DefaultSelector()
+            self._waker = socket.socketpair()
+            for sock in self._waker:
+                sock.setblocking(False)
+            self._selector.register(self._waker[0], selectors.EVENT_READ)
+        return self._selector
+
+    def _register(self, task: Task, token: int, fileobj: Any, event: int) -> None:
+        selector = self._get_selector()
+        try:
+            key = selector.get_key(fileobj)
+        except KeyError:
+            selector.register(fileobj, event, {event: [(task, token)]})
+        else:
+            # the selectors allow one key per file, the tasks share its events
+            key.data.setdefault(event, []).append((task, token))
+            selector.modify(fileobj, key.events | event, key.data)
+        self._polling[task] = (fileobj, event)
+
+    def _unpoll(self, task: Task) -> None:
+        """Drop the registration of the task resumed by a timeout or a cancel."""
+
+        if (entry := self._polling.pop(task, None)) is None:
+            return
+        fileobj, event = entry
+        try:
+            key = self._selector.get_key(fileobj)  # type: ignore[union-attr]
+        except (KeyError, ValueError):  # closed in the meantime
+            return
+        if (waiters := key.data.get(event)) is None:
+            return
+        waiters[:] = [waiter for waiter in waiters if waiter[0] is not task]
+        if not waiters:
+            self._unregister(key, event)
+
+    def _unregister(self, key: selectors.SelectorKey, event: int) -> None:
+        del key.data[event]
+        selector = self._selector
+        try:
+            if key.data:
+                selector.modify(  # type: ignore[union-attr]
+                    key.fileobj, key.events & ~event, key.data
+                )
+            else:
+                selector.unregister(key.fileobj)  # type: ignore[union-attr]
+        except (KeyError, ValueError, OSError):  # the file is closed already
+            pass
+
+    def _select(self, timeout: None | float) -> None:
+        for key, mask in self._selector.select(timeout):  # type: ignore[union-attr]
+            if key.data is None:  # the waker
+                try:
+                    while key.fileobj.recv(4096):  # type: ignore[union-attr]
+                        pass
+                except OSError:
+                    pass
+                continue
+            for event in (selectors.EVENT_READ, selectors.EVENT_WRITE):
+                if mask & event and event in key.data:
+                    waiters = key.data[event]
+                    self._unregister(key, event)
+                    for task, token in waiters:  # each one retries its call
+                        self._polling.pop(task, None)
+                        self._resume(task, token)
+        if self._selecting:
+            with self._cond:
+                self._selecting = False
+
+    def run_ready(self) -> list[Task]:
+        """Step every due task once and return the finished ones."""
+
+        self._poll()
+        finished = []
+        for _ in range(len(self._ready)):
+            task = self._ready.popleft()
+            try:
+                if (exc := self._thrown.pop(task, None)) is not None:
+                    trap = task.aw.throw(exc)
+                else:
+                    trap = next(task.aw)
+            except StopIteration as r:
+                task.res = r.value
+            except Exception as exc:
+                task.exc = exc
+            else:
+                self._schedule(task, trap)
+                continue
+            task.done = True
+            self._pending -= 1
+            finished.append(task)
+        return finished
+
+    def _schedule(self, task: Task, trap: Any) -> None:
+        if isinstance(trap, Sleep):
+            if trap.deadline > monotonic():
+                self._park(task, trap.deadline)
+                return
+        elif isinstance(trap, Wait):
+            token = self._park(task, trap.deadline)
+            trap.future.add_done_callback(lambda _: self._wake(task, token))
+            return
+        elif isinstance(trap, Poll):
+            token = self._park(task, trap.deadline)
+            self._register(task, token, trap.fileobj, trap.events)
+            return
+        self._ready.append(task)
+
+    def _park(self, task: Task, deadline: None | float) -> int:
+        token = self._parked[task] = next(self._tokens)
+        if deadline is not None:
+            self._timers.push(deadline, (task, token))
+        return token
+
+    def _next_deadline(self, deadline: None | float) -> None | float:
+        earliest = self._timers.earliest()
+        if earliest is None:
+            return deadline
+        if deadline is None:
+            return earliest
+        return min(earliest, deadline)
+
+    def idle_request(self, deadline: None | float = None) -> None | Sleep | Wait | Poll:
+        """Return what to yield to an outer driver while nothing is runnable.
+
+        With files to watch, that is the readiness of the selector itself;
+        a selector without a file descriptor is polled every few ms instead.
+        """
+
+        self._poll()
+        if self._ready:
+            return None
+        ddl = self._next_deadline(deadline)
+        with self._cond:
+            if self._woken or self._notified:
+                self._notified = False
+                return None
+            if self._polling:
+                self._selecting = True
+                selector = self._selector
+                if hasattr(selector, "fileno"):
+                    return Poll(selector, selectors.EVENT_READ, ddl)
+                ddl = min(ddl, monotonic() + _POLL_INTERVAL) if ddl else None
+                return Sleep(ddl or monotonic() + _POLL_INTERVAL)
+            self._wakeup = Future()
+            return Wait(self._wakeup, ddl)
+
+    def park(self, deadline: None | float = None) -> None:
+        """Block the OS thread until a parked task is due or woken."""
+
+        self._poll()
+        if self._ready or not self._pending:
+            return
+        ddl = self._next_deadline(deadline)
+        if self._polling:
+            with self._cond:
+                if self._woken or self._notified:
+                    self._notified = False
+                    return
+                self._selecting = True
+            self._select(None if ddl is None else max(ddl - monotonic(), 0))
+            with self._cond:
+                self._notified = False
+            return
+        with self._cond:
+            while not (self._woken or self._notified):
+                if ddl is None:
+                    self._cond.wait()
+                elif (timeout := ddl - monotonic()) > 0:
+                    self._cond.wait(timeout)
+                else:
+                    break
+            self._notified = False
+
+
+def run_until_complete(aw: Awaitable) -> Any:
+    loop = Loop()
+    task = loop.spawn(aw)
+    try:
+        while loop:
+            loop.run_ready()
+            loop.park()
+    finally:
+        loop.close()
+    return task.result()
@@ -1,12 +1,16 @@
-from datetime import datetime, timedelta
 from typing import Generator
 
+from sprint2.aiotools.timers import monotonic
+from sprint2.aiotools.traps import Sleep
+
 
 __all__ = ["async_sleep"]
 
 
-def async_sleep(seconds: float) -> Generator[None, None, float]:
-    deadline = datetime.now() + timedelta(seconds=seconds)
-    while datetime.now() <= deadline:
-        yield
-    return seconds
+def async_sleep(seconds: float) -> Generator[Sleep, None, float]:
+    deadline = monotonic() + seconds
+    # a driver may resume us early, so the deadline is re-checked every time
+    while True:
+        yield Sleep(deadline)
+        if monotonic() >= deadline:
+            return seconds
@@ -0,0 +1,49 @@
+import heapq
+from itertools import count
+from time import monotonic
+from typing import Callable, Generic, Iterator, TypeVar
+
+
+__all__ = ["TimerHeap", "monotonic"]
+
+
+T = TypeVar("T")
+
+
+class TimerHeap(Generic[T]):
+    """A min-heap of wakeup deadlines on the monotonic clock."""
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int, T]] = []
+        self._seq = count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __iter__(self) -> Iterator[T]:
+        """Iterate over the items, not in the deadline order."""
+
+        return (entry[2] for entry in self._heap)
+
+    def push(self, deadline: float, item: T) -> None:
+        # the sequence number keeps the order stable for equal deadlines
+        heapq.heappush(self._heap, (deadline, next(self._seq), item))
+
+    def retain(self, keep: Callable[[T], bool]) -> None:
+        """Drop the items failing the predicate, like the stale timers."""
+
+        self._heap = [entry for entry in self._heap if keep(entry[2])]
+        heapq.heapify(self._heap)
+
+    def earliest(self) -> None | float:
+        if self._heap:
+            return self._heap[0][0]
+        return None
+
+    def pop_due(self, now: None | float = None) -> list[T]:
+        if now is None:
+            now = monotonic()
+        heap, due = self._heap, []
+        while heap and heap[0][0] <= now:
+            due.append(heapq.heappop(heap)[2])
+        return due
@@ -0,0 +1,25 @@
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any
+
+
+__all__ = ["Poll", "Sleep", "Wait"]
+
+
+# traps are the values coroutines yield to tell their driver what they wait for
+@dataclass(frozen=True)
+class Sleep:
+    deadline: float  # on the monotonic clock
+
+
+@dataclass(frozen=True)
+class Wait:
+    future: Future
+    deadline: None | float = None  # give up waiting at this monotonic time
+
+
+@dataclass(frozen=True)
+class Poll:
+    fileobj: Any  # a file descriptor or an object with fileno()
+    events: int  # selectors.EVENT_READ or EVENT_WRITE
+    deadline: None | float = None
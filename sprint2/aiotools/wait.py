@@ -1,33 +1,32 @@
-from collections import deque
-from datetime import datetime, timedelta
 from typing import Any, Generator
 
+from sprint2.aiotools.loop import Loop, run_until_complete
+from sprint2.aiotools.timers import monotonic
+
 
 __all__ = ["async_wait", "wait"]
 
 
 def async_wait(*aws, timeout: None | float = None) -> Generator[Any, None, list]:
-    now_ = datetime.now()
-    ddl = now_ + timedelta(seconds=timeout) if timeout else None
-    coros = deque(aws)
+    ddl = monotonic() + timeout if timeout else None
+    loop = Loop()
+    for aw in aws:
+        loop.spawn(aw)
     results = []
-    while coros:
-        coro = coros.popleft()
-        try:
-            yield next(coro)
-            coros.append(coro)
-        except StopIteration as r:
-            results.append(r.value)
-        if ddl and datetime.now() > ddl:
-            msg = f"the deadline ({ddl}) is exceeded"
-            raise TimeoutError(msg)
+    try:
+        while loop:
+            for task in loop.run_ready():
+                results.append(task.result())
+            if ddl and monotonic() > ddl:
+                msg = f"the timeout ({timeout} s) is exceeded"
+                raise TimeoutError(msg)
+            if loop:
+                yield loop.idle_request(deadline=ddl)
+    finally:
+        loop.close()
     return results
 
 
 def wait(*aws, timeout: None | float = None) -> list:
     waiter = async_wait(*aws, timeout=timeout)
-    while True:
-        try:
-            next(waiter)
-        except StopIteration as result:
-            return result.value
+    return run_until_complete(waiter)
@@ -1,2 +1,5 @@
 from sprint2.jobtools.job import Job  # noqa: F401
+from sprint2.jobtools.cache import ResultCache  # noqa: F401
+from sprint2.jobtools.cancel import CancelToken  # noqa: F401
+from sprint2.jobtools.retry import RetryPolicy  # noqa: F401
 from sprint2.jobtools.runners import async_run_job  # noqa: F401
@@ -0,0 +1,218 @@
+import os
+import pickle
+from collections import OrderedDict
+from concurrent.futures import Future
+from hashlib import sha256
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Any, Callable, Mapping
+
+from sprint2.logger import sched_logger
+
+
+__all__ = ["ResultCache"]
+
+
+_MISSING = object()
+
+
+class ResultCache:
+    """Memoizes the job results by a stable hash of the function and its args.
+
+    The entries live in memory, the least recently used evicted first when
+    there are more than `max_entries` of them or their pickled size is over
+    `max_bytes`; an entry older than `ttl` seconds is a miss. With a `path`
+    the entries are also written to files in that directory, so they
+    outlive the memory tier and the process.
+
+    Concurrent calls for the same key are coalesced: the first one computes,
+    the others wait for its result (or its exception, which is not cached).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: None | int = None,
+        ttl: None | float = None,
+        path: None | str | Path = None,
+    ) -> None:
+        if max_entries < 1:
+            msg = f"max_entries must be positive, got {max_entries}"
+            raise ValueError(msg)
+        if max_bytes is not None and max_bytes < 1:
+            msg = f"max_bytes must be positive, got {max_bytes}"
+            raise ValueError(msg)
+        if ttl is not None and ttl <= 0:
+            msg = f"ttl must be positive, got {ttl}"
+            raise ValueError(msg)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._path = None if path is None else Path(path)
+        if self._path is not None:
+            self._path.mkdir(parents=True, exist_ok=True)
+        # key -> (expires at, size, value), the least recently used first
+        self._entries: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+        self._size = 0
+        self._inflight: dict[str, Future] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key_for(
+        fn: Callable, args: tuple[Any, ...], kwargs: Mapping[str, Any]
+    ) -> None | str:
+        """Return the cache key of the call, None if it cannot have one.
+
+        The function is named by its "module:qualname", so lambdas and local
+        functions are not cached, nor are the calls with unpicklable args.
+        """
+
+        module = getattr(fn, "__module__", None)
+        qualname = getattr(fn, "__qualname__", "")
+        if not module or not qualname or "<" in qualname:
+            return None
+        try:
+            call = pickle.dumps((args, sorted(kwargs.items())), protocol=4)
+        except Exception:  # pickling raises anything the objects raise
+            return None
+        return sha256(f"{module}:{qualname}".encode() + call).hexdigest()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store the value and hand it to the callers waiting for the key."""
+
+        data = None
+        if self.max_bytes is not None or self._path is not None:
+            try:
+                data = pickle.dumps(value, protocol=4)
+            except Exception:
+                sched_logger.warning("the result of %s is not picklable", key)
+        expires = time() + self.ttl if self.ttl is not None else float("inf")
+        with self._lock:
+            if data is not None or self.max_bytes is None:
+                self._store(key, expires, 0 if data is None else len(data), value)
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.set_result(value)
+        if data is not None and self._path is not None:
+            self._write(key, expires, data)
+
+    def claim(self, key: str) -> None | Future:
+        """Return a future of the result, None if the caller is to compute it.
+
+        The future is done on a hit, else it is done when the computing
+        caller calls put() or abandon().
+        """
+
+        value = self._lookup(key)
+        if value is not _MISSING:
+            hit: Future = Future()
+            hit.set_result(value)
+            return hit
+        with self._lock:
+            if (future := self._inflight.get(key)) is not None:
+                return future
+            self._inflight[key] = Future()
+        return None
+
+    def abandon(self, key: str, exc: BaseException) -> None:
+        """Fail the callers waiting for the key, the exception is not cached."""
+
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.set_exception(exc)
+
+    def call(self, key: None | str, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Return the cached result of the call, computing it on a miss."""
+
+        if key is None:
+            return fn(*args, **kwargs)
+        if (future := self.claim(key)) is not None:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.abandon(key, e)
+            raise
+        self.put(key, result)
+        return result
+
+    def clear(self) -> None:
+        """Drop the entries of both tiers."""
+
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        if self._path is not None:
+            for file in self._path.glob("*.pkl"):
+                file.unlink(missing_ok=True)
+
+    def _lookup(self, key: str) -> Any:
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None:
+                if entry[0] > time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self._entries.pop(key)
+                self._size -= entry[1]
+        if self._path is not None and (entry := self._read(key)) is not None:
+            with self._lock:
+                self._store(key, *entry)
+                self.hits += 1
+            return entry[2]
+        with self._lock:
+            self.misses += 1
+        return _MISSING
+
+    def _store(self, key: str, expires: float, size: int, value: Any) -> None:
+        # under the lock
+        if (old := self._entries.pop(key, None)) is not None:
+            self._size -= old[1]
+        self._entries[key] = (expires, size, value)
+        self._size += size
+        entries, max_bytes = self._entries, self.max_bytes
+        while len(entries) > self.max_entries or (
+            max_bytes is not None and self._size > max_bytes and len(entries) > 1
+        ):
+            self._size -= entries.popitem(last=False)[1][1]
+
+    def _file(self, key: str) -> Path:
+        return self._path / f"{key}.pkl"  # type: ignore[operator]
+
+    def _write(self, key: str, expires: float, data: bytes) -> None:
+        # replaced atomically, a concurrent reader never sees a partial entry
+        file = self._file(key)
+        tmp_file = file.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, "wb") as f:
+                pickle.dump((expires, len(data)), f, protocol=4)
+                f.write(data)
+            os.replace(tmp_file, file)
+        except OSError as e:
+            sched_logger.warning("cannot write the cache entry %s: %s", key, e)
+
+    def _read(self, key: str) -> None | tuple[float, int, Any]:
+        file = self._file(key)
+        try:
+            with open(file, "rb") as f:
+                expires, size = pickle.load(f)
+                if expires <= time():
+                    file.unlink(missing_ok=True)
+                    return None
+                return expires, size, pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # a broken entry is a miss
+            sched_logger.warning("cannot read the cache entry %s: %s", key, e)
+            return None
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from sprint2.jobtools.job import JobCancelledError, JobExpiredError
+
+
+__all__ = ["CancelToken"]
+
+
+class CancelToken:
+    """Tells a running job to give up: it is cancelled or out of its time.
+
+    A cancellable job gets the token as its `cancel_token` keyword argument
+    and polls it. The token is plain data, so a copy sent to a worker process
+    still knows the deadline, but not a later cancel().
+    """
+
+    def __init__(self, deadline: None | datetime = None) -> None:
+        self.deadline = deadline
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and datetime.now() > self.deadline
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled or self.expired
+
+    def remaining(self) -> None | float:
+        """Return the seconds left until the deadline, None without one."""
+
+        if self.deadline is None:
+            return None
+        return max((self.deadline - datetime.now()).total_seconds(), 0.0)
+
+    def raise_if_cancelled(self) -> None:
+        if self.expired:
+            msg = f"the deadline {self.deadline} is exceeded"
+            raise JobExpiredError(msg)
+        if self._cancelled:
+            msg = "the job is cancelled"
+            raise JobCancelledError(msg)
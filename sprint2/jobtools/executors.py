@@ -0,0 +1,127 @@
+import multiprocessing as mp
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from threading import Lock
+from typing import Any, Callable
+
+from sprint2.jobtools.job import JobError, JobExecutor
+
+
+__all__ = ["ProcessPool", "abandon_future", "make_executor"]
+
+
+def _call_in_child(conn: Connection, fn: Callable, args: tuple, kwargs: dict) -> None:
+    try:
+        outcome: tuple[bool, Any] = (True, fn(*args, **kwargs))
+    except Exception as exc:
+        outcome = (False, exc)
+    try:
+        conn.send(outcome)
+    except Exception as exc:  # the result or the exception is not picklable
+        conn.send((False, JobError(f"cannot send back {outcome[1]!r}: {exc}")))
+    finally:
+        conn.close()
+
+
+class ProcessPool(Executor):
+    """Runs every call in its own worker process, at most max_workers at once.
+
+    Unlike ProcessPoolExecutor a single call can be terminated, which is how
+    a runaway job is stopped at its deadline.
+    """
+
+    def __init__(self, max_workers: int = 1) -> None:
+        # the threads only babysit the processes and hold the pool slots
+        self._slots = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="sprint2-proc"
+        )
+        self._ctx = mp.get_context()
+        self._procs: dict[Future, BaseProcess] = {}
+        self._doomed: set[Future] = set()  # terminated before their start
+        self._lock = Lock()
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        future: Future = Future()
+        self._slots.submit(self._run, future, fn, args, kwargs)
+        return future
+
+    def _run(self, future: Future, fn: Callable, args: tuple, kwargs: dict) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            self._call(future, fn, args, kwargs)
+        except BaseException as exc:  # the slot thread would swallow it
+            with self._lock:
+                proc = self._procs.pop(future, None)
+            if proc is not None and proc.is_alive():
+                proc.terminate()
+                proc.join()
+            if not future.done():
+                msg = f"the worker has failed: {exc!r}"
+                future.set_exception(JobError(msg))
+
+    def _call(self, future: Future, fn: Callable, args: tuple, kwargs: dict) -> None:
+        receiver, sender = self._ctx.Pipe(duplex=False)
+        proc = self._ctx.Process(
+            target=_call_in_child, args=(sender, fn, args, kwargs), daemon=True
+        )
+        try:
+            with self._lock:
+                if future in self._doomed:
+                    self._doomed.remove(future)
+                    receiver.close()
+                    future.set_exception(JobError("the worker is terminated"))
+                    return
+                self._procs[future] = proc
+                proc.start()
+        except BaseException:
+            receiver.close()
+            raise
+        finally:
+            sender.close()
+        try:
+            ok, value = receiver.recv()
+        except EOFError:  # the worker died silently, e.g. it was terminated
+            ok, value = False, None
+        finally:
+            receiver.close()
+            proc.join()
+            with self._lock:
+                self._procs.pop(future, None)
+        if ok:
+            future.set_result(value)
+        elif value is None:
+            msg = f"the worker exited with the code {proc.exitcode}"
+            future.set_exception(JobError(msg))
+        else:
+            future.set_exception(value)
+
+    def terminate(self, future: Future) -> None:
+        """Cancel the call if it is queued, kill its process if it is running."""
+
+        if future.cancel():
+            return
+        with self._lock:
+            if (proc := self._procs.get(future)) is not None:
+                proc.terminate()
+            elif not future.done():
+                self._doomed.add(future)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._slots.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+def make_executor(mode: JobExecutor, max_workers: int = 1) -> Executor:
+    if mode is JobExecutor.PROCESS:
+        return ProcessPool(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sprint2-job")
+
+
+def abandon_future(executor: Executor, future: Future) -> None:
+    """Give up a call nobody waits for: a process is killed, a thread is left."""
+
+    if isinstance(executor, ProcessPool):
+        executor.terminate(future)
+    else:
+        future.cancel()
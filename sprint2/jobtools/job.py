@@ -1,24 +1,46 @@
 from copy import deepcopy
 from datetime import datetime, timedelta
-from typing import Any, Callable, Iterable, Mapping
+from enum import Enum
+from inspect import isgeneratorfunction, unwrap
+from itertools import count
+from typing import Any, Callable, Hashable, Iterable, Mapping
 
-from pydantic import BaseModel, NonNegativeInt, ValidationError
+from pydantic import NonNegativeInt
 
+from sprint2.aiotools import run_until_complete
+from sprint2.jobtools.cache import ResultCache
+from sprint2.jobtools.retry import RetryPolicy
 
-__all__ = ["Job", "JobError", "JobInfo"]
+
+__all__ = [
+    "Job",
+    "JobCancelledError",
+    "JobError",
+    "JobExecutor",
+    "JobExpiredError",
+]
 
 
 class JobError(Exception):
     pass
 
 
-class JobInfo(BaseModel):
-    fn: Callable
-    args: tuple[Any, ...] = ()
-    kwargs: dict[str, Any] = {}
-    max_retries: NonNegativeInt = 0
-    start: None | datetime = None
-    duration: None | NonNegativeInt = None
+class JobCancelledError(JobError):
+    """The job is cancelled before it has finished."""
+
+
+class JobExpiredError(TimeoutError):
+    """The job has run out of its duration."""
+
+
+class JobExecutor(str, Enum):
+    INLINE = "inline"  # in the scheduler thread
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+_IMMEDIATE_RETRY = RetryPolicy()
+_job_ids = count(1)
 
 
 def validate_job_type(job: "Job") -> "Job":
@@ -28,7 +50,106 @@ def validate_job_type(job: "Job") -> "Job":
     return job
 
 
+def _validate_count(name: str, value: Any, optional: bool = False) -> None:
+    if value is None and optional:
+        return
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        msg = f"{name} must be a non-negative integer, got {value!r}"
+        raise JobError(msg)
+
+
+def _validate_options(
+    fn: Callable,
+    max_retries: int,
+    start: None | datetime,
+    duration: None | int,
+    executor: JobExecutor | str,
+    priority: int,
+    retry: None | RetryPolicy,
+    cache: None | ResultCache,
+) -> JobExecutor:
+    """Check the options shared by the jobs of a bulk, return the executor."""
+
+    if not callable(fn):
+        msg = f"{fn!r} is not callable"
+        raise JobError(msg)
+    if executor != JobExecutor.INLINE and _is_generator_fn(fn):
+        msg = f"a generator job {fn!r} runs on the loop, not in the {executor}"
+        raise JobError(msg)
+    _validate_count("max_retries", max_retries)
+    _validate_count("duration", duration, optional=True)
+    if start is not None and not isinstance(start, datetime):
+        msg = f"start must be a datetime, got {start!r}"
+        raise JobError(msg)
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        msg = f"priority must be an integer, got {priority!r}"
+        raise JobError(msg)
+    if retry is not None and not isinstance(retry, RetryPolicy):
+        msg = f"retry must be a RetryPolicy, got {retry!r}"
+        raise JobError(msg)
+    if cache is not None and not isinstance(cache, ResultCache):
+        msg = f"cache must be a ResultCache, got {cache!r}"
+        raise JobError(msg)
+    try:
+        return JobExecutor(executor)
+    except ValueError as e:
+        raise JobError(str(e)) from e
+
+
+def _is_generator_fn(fn: Callable) -> bool:
+    # a @coroutine function is a wrapper of a generator function
+    return isgeneratorfunction(unwrap(fn))
+
+
+def _to_args(args: None | Iterable[Any]) -> tuple[Any, ...]:
+    try:
+        return tuple(args) if args else ()
+    except TypeError as e:
+        raise JobError(str(e)) from e
+
+
+def _to_kwargs(kwargs: None | Mapping[str, Any]) -> None | dict[str, Any]:
+    if not kwargs:
+        return None
+    try:
+        dct = dict(kwargs)
+    except (TypeError, ValueError) as e:
+        raise JobError(str(e)) from e
+    if not all(isinstance(name, str) for name in dct):
+        msg = f"the keyword names must be strings, got {list(dct)}"
+        raise JobError(msg)
+    return dct
+
+
+def _run_generator(fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    return run_until_complete(fn(*args, **kwargs))
+
+
 class Job:
+    """A unit of work: a call with its scheduling options and dependencies.
+
+    The options are validated once, in the constructor; the job keeps them in
+    slots, so a million of jobs are cheap to create and to hold.
+    """
+
+    __slots__ = (
+        "_fn",
+        "_args",
+        "_kwargs",
+        "_max_retries",
+        "_retry",
+        "_start",
+        "_duration",
+        "_executor",
+        "_priority",
+        "_by_deadline",
+        "_cancellable",
+        "_cache",
+        "_deps",
+        "_key",
+        "_id",
+    )
+
     def __init__(
         self,
         fn: Callable,
@@ -38,75 +159,242 @@ class Job:
         start: None | datetime = None,
         duration: None | NonNegativeInt = None,
         dependencies: None | Iterable["Job"] = None,
+        executor: JobExecutor | str = JobExecutor.INLINE,
+        priority: int = 0,
+        by_deadline: bool = False,
+        retry: None | RetryPolicy = None,
+        cancellable: bool = False,
+        cache: None | ResultCache = None,
     ) -> None:
+        self._executor = _validate_options(
+            fn, max_retries, start, duration, executor, priority, retry, cache
+        )
+        self._fn = fn
+        self._args = _to_args(args)
+        self._kwargs = _to_kwargs(kwargs)  # None if empty, saves a dict a job
+        self._max_retries = max_retries
+        self._retry = retry
+        self._start = start
+        self._duration = duration
+        self._priority = priority
+        self._by_deadline = bool(by_deadline)
+        self._cancellable = bool(cancellable)
+        self._cache = cache
         try:
-            self._info = JobInfo(
-                fn=fn,
-                args=tuple(args) if args else (),
-                kwargs=dict(kwargs) if kwargs else {},
-                max_retries=max_retries,
-                start=start,
-                duration=duration,
-            )
-            self._deps: list["Job"] = (
-                [validate_job_type(job) for job in dependencies] if dependencies else []
-            )
-        except (TypeError, ValidationError) as e:
+            deps = [validate_job_type(job) for job in dependencies or ()]
+        except TypeError as e:
             raise JobError(str(e)) from e
+        self._deps: None | list[Job] = deps or None
+        self._key: None | Hashable = None
+        self._id = next(_job_ids)
+
+    @classmethod
+    def bulk(
+        cls,
+        fn: Callable,
+        args_iterable: Iterable[Iterable[Any]],
+        kwargs: None | Mapping[str, Any] = None,
+        **options: Any,
+    ) -> list["Job"]:
+        """Return a job per the args item, like itertools.starmap.
+
+        The function, the keywords and the options are shared by the jobs and
+        validated once.
+        """
+
+        proto = cls(fn, kwargs=kwargs, **options)
+        jobs = []
+        for args in args_iterable:
+            job = proto._clone()
+            job._args = _to_args(args)
+            jobs.append(job)
+        return jobs
+
+    def _clone(self) -> "Job":
+        # a copy without the validation, the containers are not shared
+        job = object.__new__(self.__class__)
+        job._fn = self._fn
+        job._args = self._args
+        job._kwargs = None if self._kwargs is None else self._kwargs.copy()
+        job._max_retries = self._max_retries
+        job._retry = self._retry
+        job._start = self._start
+        job._duration = self._duration
+        job._executor = self._executor
+        job._priority = self._priority
+        job._by_deadline = self._by_deadline
+        job._cancellable = self._cancellable
+        job._cache = self._cache
+        job._deps = None if self._deps is None else self._deps.copy()
+        job._key = None
+        job._id = next(_job_ids)
+        return job
+
+    def _options(self) -> tuple:
+        return (
+            self._fn,
+            self._args,
+            self._kwargs,
+            self._max_retries,
+            self._retry,
+            self._start,
+            self._duration,
+            self._executor,
+            self._priority,
+            self._by_deadline,
+            self._cancellable,
+            self._cache,
+        )
 
-    def __eq__(self, other) -> bool:
-        sinfo = self._info
-        if isinstance(other, Job):
-            info = sinfo == other._info
-            deps = self.dependencies == other.dependencies
-            return info and deps
-        return sinfo == other
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Job):
+            return NotImplemented
+        # the dependency trees are compared pairwise, without recursion
+        stack, seen = [(self, other)], set()
+        while stack:
+            job, another = stack.pop()
+            if job is another or (pair := (id(job), id(another))) in seen:
+                continue
+            seen.add(pair)
+            deps, other_deps = job.dependencies, another.dependencies
+            if job._options() != another._options() or len(deps) != len(other_deps):
+                return False
+            stack.extend(zip(deps, other_deps))
+        return True
+
+    __hash__ = None  # type: ignore[assignment]
 
     def __repr__(self) -> str:
         cls_name = self.__class__.__name__
         dct = self.to_dict()
         return f"{cls_name}<{dct}>"
 
+    def __str__(self) -> str:
+        # a short name for the logs, the repr walks all the dependencies
+        fn = self._fn
+        name = getattr(fn, "__qualname__", type(fn).__name__)
+        return f"{self.__class__.__name__}#{self._id}<{name}>"
+
+    @property
+    def id(self) -> int:
+        """Return the number of the job, unique within the process."""
+
+        return self._id
+
+    @property
+    def key(self) -> Hashable:
+        """Return a key shared by jobs doing the same work.
+
+        The dependencies and the scheduling priority are not a part of it,
+        the retry policy, the cache and the deadline ordering are.
+        A scheduler combines it with the keys of the dependency nodes, so the
+        key stays flat however deep the dependency chain is.
+        """
+
+        if self._key is None:
+            key: Hashable = (
+                self._fn,
+                self._args,
+                tuple(sorted(self._kwargs.items())) if self._kwargs else (),
+                self._max_retries,
+                self._start,
+                self._duration,
+                self._executor,
+                self._cancellable,
+                self._retry,
+                self._cache,
+                self._by_deadline,
+            )
+            try:
+                hash(key)
+            except TypeError:  # unhashable arguments, fall back to the identity
+                key = ("id", id(self))
+            self._key = key
+        return self._key
+
     @property
     def func(self) -> Callable:
-        return self._info.fn
+        return self._fn
 
     @property
     def args(self) -> tuple[Any, ...]:
-        return self._info.args
+        return self._args
 
     @property
     def kwargs(self) -> dict[str, Any]:
-        return self._info.kwargs
+        return {} if self._kwargs is None else self._kwargs
 
     @property
-    def max_retries(self) -> None | NonNegativeInt:
-        return self._info.max_retries
+    def max_retries(self) -> NonNegativeInt:
+        return self._max_retries
+
+    @property
+    def retry(self) -> RetryPolicy:
+        """Return the retry policy, restarts are immediate by default."""
+
+        if (retry := self._retry) is None:
+            return _IMMEDIATE_RETRY
+        return retry
 
     @property
     def start(self) -> None | datetime:
-        return self._info.start
+        return self._start
 
     @property
     def duration(self) -> None | NonNegativeInt:
-        return self._info.duration
+        return self._duration
+
+    @property
+    def executor(self) -> JobExecutor:
+        return self._executor
+
+    @property
+    def priority(self) -> int:
+        return self._priority
+
+    @property
+    def by_deadline(self) -> bool:
+        return self._by_deadline
+
+    @property
+    def cancellable(self) -> bool:
+        """Whether the function takes a `cancel_token` keyword argument."""
+
+        return self._cancellable
+
+    @property
+    def cache(self) -> None | ResultCache:
+        """Return the cache of the results, equal calls then run once."""
+
+        return self._cache
+
+    @property
+    def is_generator(self) -> bool:
+        """Whether the function yields traps to the loop, see aiotools."""
+
+        return _is_generator_fn(self._fn)
 
     @property
     def dependencies(self) -> list["Job"]:
-        return self._deps
+        return [] if self._deps is None else self._deps
 
-    def get_deadline(self) -> None | datetime:
-        now_ = datetime.now()
-        start = self.start
+    def get_deadline(self, started: None | datetime = None) -> None | datetime:
+        """Return when the duration runs out.
+
+        Without a start time the duration counts from `started`, the moment
+        the job has actually started; before that it is only an estimate.
+        """
+
+        start = self.start or started
         if start is None:
-            start = now_
+            start = datetime.now()
         duration = self.duration
         if duration is not None:
             return start + timedelta(seconds=duration)
         return None
 
-    def is_expired(self) -> bool:
-        deadline = self.get_deadline()
+    def is_expired(self, started: None | datetime = None) -> bool:
+        deadline = self.get_deadline(started)
         if deadline is None:
             return False
         now_ = datetime.now()
@@ -138,10 +426,20 @@ class Job:
             "kwargs": self.kwargs,
             "start": self.start,
             "max_retries": self.max_retries,
+            "retry": self._retry,
             "duration": self.duration,
-            "dependencies": [dep_job.to_dict() for dep_job in self._deps],
+            "executor": self.executor,
+            "priority": self.priority,
+            "by_deadline": self.by_deadline,
+            "cancellable": self.cancellable,
+            "cache": self.cache,
+            "dependencies": [dep_job.to_dict() for dep_job in self.dependencies],
         }
 
     def run(self) -> Any:
         f, a, k = self.func, self.args, self.kwargs
-        return f(*a, **k)
+        if self.is_generator:
+            f, a = _run_generator, (f, *a)
+        if (cache := self._cache) is None:
+            return f(*a, **k)
+        return cache.call(cache.key_for(self.func, self.args, k), f, *a, **k)
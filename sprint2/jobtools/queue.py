@@ -0,0 +1,151 @@
+import heapq
+from enum import Enum
+from itertools import count
+from math import floor, inf
+from threading import Condition
+from typing import Callable, Generic, Iterator, TypeVar
+
+from sprint2.aiotools.timers import monotonic
+
+
+__all__ = ["Capacity", "OverflowPolicy", "ReadyQueue"]
+
+
+T = TypeVar("T")
+
+
+class ReadyQueue(Generic[T]):
+    """A heap of ready items: a higher priority first, FIFO within a level.
+
+    An item with a deadline goes before the items of its level without one,
+    the earliest deadline first. With aging an item gains one priority level
+    per `aging` seconds of waiting; all the items age at the same pace, so
+    the order only depends on `priority - enqueued_at / aging` and a key never
+    has to be updated in the heap. That is rounded down to whole levels, the
+    items of a level enqueued within one period are ordered by the deadlines.
+    """
+
+    def __init__(self, aging: None | float = None) -> None:
+        if aging is not None and aging <= 0:
+            msg = f"the aging period must be positive, got {aging}"
+            raise ValueError(msg)
+        self._aging = aging
+        self._heap: list[tuple[int, float, int, T]] = []
+        self._seq = count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __iter__(self) -> Iterator[T]:
+        """Iterate over the items, not in the pop order."""
+
+        return (entry[-1] for entry in self._heap)
+
+    def retain(self, keep: Callable[[T], bool]) -> None:
+        """Drop the items failing the predicate, like the stale ones."""
+
+        self._heap = [entry for entry in self._heap if keep(entry[-1])]
+        heapq.heapify(self._heap)
+
+    def push(self, item: T, priority: int = 0, deadline: None | float = None) -> None:
+        level = -priority
+        if self._aging is not None:
+            level = floor(level + monotonic() / self._aging)
+        ddl = inf if deadline is None else deadline
+        heapq.heappush(self._heap, (level, ddl, next(self._seq), item))
+
+    def pop(self) -> T:
+        try:
+            return heapq.heappop(self._heap)[-1]
+        except IndexError:
+            msg = "pop from an empty queue"
+            raise IndexError(msg) from None
+
+
+class OverflowPolicy(str, Enum):
+    BLOCK = "block"  # wait for room, up to a timeout
+    RAISE = "raise"
+    DROP_OLDEST = "drop_oldest"  # make room by dropping the oldest queued item
+    DROP_LOWEST = "drop_lowest"  # or the lowest priority one, maybe the new one
+
+
+class Capacity:
+    """Counts the queued items against a limit, safe for many threads.
+
+    Crossing the high watermark upwards calls `on_high`, falling back to the
+    low one calls `on_low`; the callbacks run on the thread doing the change,
+    outside the lock, so a producer may be throttled before the limit.
+    """
+
+    def __init__(
+        self,
+        limit: None | int = None,
+        watermarks: None | tuple[int, int] = None,
+        on_high: None | Callable[[], None] = None,
+        on_low: None | Callable[[], None] = None,
+    ) -> None:
+        if limit is not None and limit < 1:
+            msg = f"the limit must be positive, got {limit}"
+            raise ValueError(msg)
+        if watermarks is not None and not 0 <= watermarks[0] < watermarks[1]:
+            msg = f"the watermarks must be 0 <= low < high, got {watermarks}"
+            raise ValueError(msg)
+        self.limit = limit
+        self._low: float
+        self._high: float
+        self._low, self._high = watermarks or (-1, inf)
+        self._on_high = on_high
+        self._on_low = on_low
+        self._above = False  # between crossing the high and the low marks
+        self._size = 0
+        self._cond = Condition()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def reserve(
+        self,
+        num: int,
+        block: bool = True,
+        timeout: None | float = None,
+        force: bool = False,
+    ) -> bool:
+        """Take room for `num` items, return False if there is none in time.
+
+        A forced reservation never waits and may go over the limit.
+        """
+
+        with self._cond:
+            if self.limit is not None and not force:
+                if block:
+                    room = self._cond.wait_for(
+                        lambda: self._size + num <= self.limit, timeout  # type: ignore
+                    )
+                else:
+                    room = self._size + num <= self.limit
+                if not room:
+                    return False
+            self._size += num
+            callback = self._crossed()
+        if callback is not None:
+            callback()
+        return True
+
+    def release(self, num: int) -> None:
+        if not num:
+            return
+        with self._cond:
+            self._size -= num
+            self._cond.notify_all()
+            callback = self._crossed()
+        if callback is not None:
+            callback()
+
+    def _crossed(self) -> None | Callable[[], None]:
+        if not self._above and self._size >= self._high:
+            self._above = True
+            return self._on_high
+        if self._above and self._size <= self._low:
+            self._above = False
+            return self._on_low
+        return None
@@ -0,0 +1,33 @@
+from importlib import import_module
+from typing import Any, Callable
+
+from sprint2.jobtools.job import JobError
+
+
+__all__ = ["dump_fn_ref", "load_fn_ref"]
+
+
+def dump_fn_ref(fn: Callable) -> str:
+    """Return the importable "module:qualname" reference to the function."""
+
+    module, qualname = getattr(fn, "__module__", None), getattr(fn, "__qualname__", "")
+    if not module or not qualname or "<" in qualname:  # lambdas and local objects
+        msg = f"{fn!r} is not importable by a reference"
+        raise JobError(msg)
+    ref = f"{module}:{qualname}"
+    if load_fn_ref(ref) != fn:
+        msg = f"{ref} does not refer back to {fn!r}"
+        raise JobError(msg)
+    return ref
+
+
+def load_fn_ref(ref: str) -> Callable:
+    try:
+        module_name, qualname = ref.split(":")
+        obj: Any = import_module(module_name)
+        for attr in qualname.split("."):
+            obj = getattr(obj, attr)
+    except (ValueError, ImportError, AttributeError) as e:
+        msg = f"cannot load the function by the reference {ref!r}"
+        raise JobError(msg) from e
+    return obj
@@ -0,0 +1,32 @@
+from random import random
+from pydantic import BaseModel, ConfigDict, Field, NonNegativeFloat
+
+
+__all__ = ["RetryPolicy"]
+
+
+class RetryPolicy(BaseModel):
+    """How a failed job is restarted: when, and after which exceptions.
+
+    The n-th restart waits `backoff * factor ** (n - 1)` seconds, capped by
+    `max_delay`, and then shortened by a random share up to `jitter`.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    backoff: NonNegativeFloat = 0.0
+    factor: float = Field(default=2.0, ge=1.0)
+    max_delay: None | NonNegativeFloat = None
+    jitter: float = Field(default=0.0, ge=0.0, le=1.0)
+    retry_on: tuple[type[Exception], ...] = (Exception,)
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return isinstance(exc, self.retry_on)
+
+    def get_delay(self, attempt: int) -> float:
+        delay = self.backoff * self.factor ** (attempt - 1)
+        if self.max_delay is not None:
+            delay = min(delay, self.max_delay)
+        if self.jitter:
+            delay *= 1 - self.jitter * random()
+        return delay
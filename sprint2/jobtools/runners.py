@@ -1,53 +1,174 @@
-from datetime import datetime
-from typing import Generator
+from concurrent.futures import Executor, Future
+from datetime import datetime, timedelta
+from typing import Any, Callable, Generator, Iterable, Mapping
 
-from sprint2.aiotools import coroutine, async_wait, async_sleep
-from sprint2.jobtools.job import Job, JobError, validate_job_type
+from sprint2.aiotools import Awaitable, coroutine, async_result, async_wait, async_sleep
+from sprint2.jobtools.cancel import CancelToken
+from sprint2.jobtools.executors import abandon_future, make_executor
+from sprint2.jobtools.job import (
+    Job,
+    JobCancelledError,
+    JobError,
+    JobExecutor,
+    JobExpiredError,
+    validate_job_type,
+)
 from sprint2.logger import sched_logger
 
 
 __all__ = ["async_run_job"]
 
 
-def _check_job_expired(job: Job) -> None:
-    if job.is_expired():
+def _check_job_expired(job: Job, started: None | datetime = None) -> None:
+    if job.is_expired(started):
         msg = f"the {job} is expired"
-        raise TimeoutError(msg)
+        raise JobExpiredError(msg)
+
+
+def _async_submit(
+    job: Job, executor: Executor, kwargs: dict[str, Any], token: CancelToken
+) -> Generator[Any, None, Any]:
+    future = executor.submit(job.func, *job.args, **kwargs)
+    try:
+        return (yield from async_result(future, timeout=token.remaining()))
+    except TimeoutError as e:
+        if future.done():  # raised by the function itself
+            raise
+        msg = f"the {job} is expired"
+        raise JobExpiredError(msg) from e
+    finally:
+        if not future.done():
+            token.cancel()  # a thread cannot be killed, it is asked to stop
+            abandon_future(executor, future)
+
+
+def _async_drive(
+    job: Job, aw: Awaitable, token: CancelToken
+) -> Generator[Any, None, Any]:
+    """Step a generator job on the loop, checking its token at every yield."""
+
+    try:
+        trap = next(aw)
+        while True:
+            token.raise_if_cancelled()
+            try:
+                yield trap
+            except Exception as e:  # thrown by the loop, the job may clean up
+                trap = aw.throw(e)
+            else:
+                trap = next(aw)
+    except StopIteration as r:
+        return r.value
+    finally:
+        aw.close()
+
+
+def _async_call(
+    job: Job, executors: None | Mapping[JobExecutor, Executor], token: CancelToken
+) -> Generator[Any, None, Any]:
+    kwargs = {**job.kwargs, "cancel_token": token} if job.cancellable else job.kwargs
+    if job.is_generator:
+        # interleaved with the other jobs, preempted at its yields
+        return (yield from _async_drive(job, job.func(*job.args, **kwargs), token))
+    if job.executor is JobExecutor.INLINE:
+        result = job.func(*job.args, **kwargs)
+        # an inline call cannot be preempted, so its late result is dropped
+        token.raise_if_cancelled()
+        return result
+    if executors and (executor := executors.get(job.executor)):
+        return (yield from _async_submit(job, executor, kwargs, token))
+    # nobody shares a pool with us, so the job gets a private worker
+    own_executor = make_executor(job.executor)
+    try:
+        return (yield from _async_submit(job, own_executor, kwargs, token))
+    finally:
+        own_executor.shutdown(wait=False)
+
+
+def _async_retry(
+    job: Job,
+    executors: None | Mapping[JobExecutor, Executor],
+    on_retry: None | Callable[[Exception], None],
+    token: CancelToken,
+) -> Generator[Any, None, Any]:
+    policy, attempt = job.retry, 0
+    while True:
+        token.raise_if_cancelled()
+        try:
+            return (yield from _async_call(job, executors, token))
+        except (JobCancelledError, JobExpiredError):
+            raise
+        except Exception as e:
+            if attempt >= job.max_retries or not policy.is_retryable(e):
+                sched_logger.exception("%s has failed with an exception: %s", job, e)
+                raise JobError(str(e)) from e
+            attempt += 1
+            delay = policy.get_delay(attempt)
+            deadline = token.deadline
+            if deadline and datetime.now() + timedelta(seconds=delay) > deadline:
+                msg = f"the {job} has no time left for the retry {attempt}"
+                raise JobExpiredError(msg) from e
+            sched_logger.warning(
+                "%s: the attempt %s failed, retrying in %s seconds", job, attempt, delay
+            )
+            if on_retry is not None:
+                on_retry(e)
+        # the backoff parks the job on the timer queue instead of re-polling
+        yield from async_sleep(delay)
 
 
 # these yield expressions are like async await statements
 @coroutine
-def async_run_job(job: Job) -> Generator:
+def async_run_job(
+    job: Job,
+    dependencies: None | Iterable[Future] = None,
+    executors: None | Mapping[JobExecutor, Executor] = None,
+    on_retry: None | Callable[[Exception], None] = None,
+    token: None | CancelToken = None,
+) -> Generator:
+    """Run the job once its dependencies are done.
+
+    The duration counts from the actual start, unless the token passed in
+    already has a deadline. The token is cancelled when a call is abandoned.
+    """
+
     validate_job_type(job)
-    yield from async_wait(*[async_run_job(dep) for dep in job.dependencies])
+    if token is None:
+        token = CancelToken()
+    if dependencies is None:
+        yield from async_wait(
+            *[async_run_job(dep, executors=executors) for dep in job.dependencies]
+        )
+    else:
+        # the dependencies are run by the caller, we only wait for them
+        for dep_future in dependencies:
+            yield from async_result(dep_future)
     _check_job_expired(job)
     if (start := job.start) and (not job.is_startable()):
-        to_sleep: float = (start - datetime.now()).seconds
-        sched_logger.info(f"{job}: sleeping for {to_sleep} seconds")
-        for _ in async_sleep(seconds=to_sleep):
-            yield
+        to_sleep: float = (start - datetime.now()).total_seconds()
+        sched_logger.info("%s: sleeping for %s seconds", job, to_sleep)
+        for trap in async_sleep(seconds=to_sleep):
+            yield trap
             _check_job_expired(job)
-    f = job.run
-    result = None
     yield
-    if max_retries := job.max_retries:
-        sched_logger.info(f"{job}: trying {max_retries} times")
-        retries = 1
-        while retries < max_retries:
-            _check_job_expired(job)
-            try:
-                result = f()
-                break
-            except Exception:
-                sched_logger.warning(f"{job}: the retry {retries} failed")
-                yield
-    _check_job_expired(job)
-    try:
-        result = f()
-    except Exception as e:
-        msg = f"{job} has failed with an exception: {e}"
-        sched_logger.exception(msg)
-        raise JobError(str(e)) from e
+    if token.deadline is None:
+        token.deadline = job.get_deadline(started=datetime.now())
+    cache = job.cache
+    if cache is None or (key := cache.key_for(job.func, job.args, job.kwargs)) is None:
+        result = yield from _async_retry(job, executors, on_retry, token)
+    elif (future := cache.claim(key)) is not None:
+        # a hit, or an equal job is running, it computes for both of us
+        result = yield from async_result(future)
+    else:
+        try:
+            result = yield from _async_retry(job, executors, on_retry, token)
+        except Exception as e:
+            cache.abandon(key, e)
+            raise
+        except BaseException:  # closed, the waiters are left without a result
+            cache.abandon(key, JobCancelledError(f"the {job} is cancelled"))
+            raise
+        cache.put(key, result)
     yield
-    sched_logger.info(f"{job}: finished with the result {result!r}")
+    sched_logger.info("%s: finished with the result %r", job, result)
     return result
@@ -0,0 +1,207 @@
+import json
+import os
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from threading import Lock
+from typing import Any, TextIO
+
+from sprint2.jobtools.job import Job, JobError
+from sprint2.jobtools.refs import dump_fn_ref, load_fn_ref
+from sprint2.jobtools.retry import RetryPolicy
+from sprint2.logger import sched_logger
+
+
+__all__ = ["Journal", "JournalError", "JournalOp"]
+
+
+class JournalError(Exception):
+    pass
+
+
+class JournalOp(str, Enum):
+    PUSHED = "pushed"
+    STARTED = "started"
+    RETRIED = "retried"
+    FINISHED = "finished"
+    FAILED = "failed"
+    POPPED = "popped"
+    CANCELLED = "cancelled"
+
+
+_DONE_OPS = {
+    JournalOp.FINISHED,
+    JournalOp.FAILED,
+    JournalOp.POPPED,
+    JournalOp.CANCELLED,
+}
+
+
+def encode_job(job: Job) -> dict[str, Any]:
+    """Return the job as a JSON-ready dictionary, functions become references."""
+
+    dct = job.to_dict()
+    dct["fn"] = dump_fn_ref(job.func)
+    dct["args"] = list(job.args)
+    dct["start"] = job.start.isoformat() if job.start else None
+    dct["executor"] = job.executor.value
+    if (retry := dct["retry"]) is not None:
+        dct["retry"] = retry.model_dump()
+        dct["retry"]["retry_on"] = [dump_fn_ref(exc) for exc in retry.retry_on]
+    dct["cache"] = None  # a process resource, a restored job runs uncached
+    dct["dependencies"] = [encode_job(dep) for dep in job.dependencies]
+    return dct
+
+
+def decode_job(dct: dict[str, Any]) -> Job:
+    params = dict(dct)
+    params["fn"] = load_fn_ref(params["fn"])
+    if start := params["start"]:
+        params["start"] = datetime.fromisoformat(start)
+    if (retry := params["retry"]) is not None:
+        retry_on = tuple(load_fn_ref(ref) for ref in retry["retry_on"])
+        params["retry"] = RetryPolicy(**{**retry, "retry_on": retry_on})
+    params["dependencies"] = [decode_job(dep) for dep in params["dependencies"]]
+    return Job(**params)
+
+
+class Journal:
+    """A write-ahead log of job state transitions with compacted snapshots.
+
+    The log is appended with one JSON record per transition; every
+    `snapshot_every` records the still pending jobs are written to a snapshot
+    and the log is started anew, so a recovery reads the snapshot and the
+    log tail only.
+    """
+
+    LOG_NAME = "journal.log"
+    SNAPSHOT_NAME = "snapshot.json"
+
+    def __init__(
+        self, path: str | Path, snapshot_every: int = 1000, fsync: bool = False
+    ) -> None:
+        self._dir = Path(path)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._log_path = self._dir / self.LOG_NAME
+        self._snapshot_path = self._dir / self.SNAPSHOT_NAME
+        self._snapshot_every = snapshot_every
+        self._fsync = fsync
+        self._lock = Lock()
+        self._pending: dict[int, dict[str, Any]] = {}  # seq -> record
+        self._lsn = 0  # the number of the last written log record
+        self._seq = 0  # the number of the last pushed job
+        self._since_snapshot = 0
+        self._recover()
+        self._log: TextIO = self._log_path.open("a", encoding="utf-8")
+
+    def _recover(self) -> None:
+        snapshot_lsn = 0
+        if self._snapshot_path.exists():
+            with self._snapshot_path.open(encoding="utf-8") as f:
+                snapshot = json.load(f)
+            snapshot_lsn = self._lsn = snapshot["lsn"]
+            self._seq = snapshot["seq"]
+            self._pending = {int(seq): rec for seq, rec in snapshot["jobs"].items()}
+        if not self._log_path.exists():
+            return
+        with self._log_path.open("rb+") as f:
+            good_end = 0  # where the last whole record ends
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):  # a record is written whole
+                        raise ValueError(line)
+                    record = json.loads(line)
+                except ValueError:  # a torn write at the crash
+                    # cut it off, or the next record would be glued to it
+                    sched_logger.warning("the journal tail is corrupted, dropped")
+                    f.truncate(good_end)
+                    break
+                good_end += len(line)
+                if record["lsn"] > snapshot_lsn:
+                    self._apply(record)
+                    self._since_snapshot += 1
+
+    def _apply(self, record: dict[str, Any]) -> None:
+        op, seq = record["op"], record["seq"]
+        self._lsn = record["lsn"]
+        self._seq = max(self._seq, seq)
+        if op == JournalOp.PUSHED:
+            self._pending[seq] = {"job": record["job"], "state": op, "retries": 0}
+        elif op in _DONE_OPS:
+            self._pending.pop(seq, None)
+        elif (pending := self._pending.get(seq)) is not None:
+            pending["state"] = op
+            if op == JournalOp.RETRIED:
+                pending["retries"] += 1
+
+    def next_seq(self) -> int:
+        with self._lock:
+            self._seq += 1
+            return self._seq
+
+    def append(self, op: JournalOp, seq: int, job: None | Job = None) -> None:
+        record: dict[str, Any] = {"op": op, "seq": seq}
+        if job is not None:
+            try:
+                record["job"] = encode_job(job)
+            except JobError as e:
+                raise JournalError(str(e)) from e
+        with self._lock:
+            record["lsn"] = self._lsn + 1
+            try:
+                line = json.dumps(record)
+            except TypeError as e:
+                msg = f"the job #{seq} is not JSON serializable: {e}"
+                raise JournalError(msg) from e
+            self._log.write(line + "\n")
+            self._log.flush()
+            if self._fsync:
+                os.fsync(self._log.fileno())
+            self._apply(record)
+            self._since_snapshot += 1
+            if self._since_snapshot >= self._snapshot_every:
+                self._compact()
+
+    def pending(self) -> list[tuple[int, Job]]:
+        """Return the jobs not finished yet, in the push order.
+
+        The retries made before are deducted from the retry budget of a job.
+        """
+
+        with self._lock:
+            records = sorted(self._pending.items())
+        jobs = []
+        for seq, rec in records:
+            dct = rec["job"]
+            if retries := rec["retries"]:
+                dct = {**dct, "max_retries": max(dct["max_retries"] - retries, 0)}
+            jobs.append((seq, decode_job(dct)))
+        return jobs
+
+    def snapshot(self) -> None:
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        snapshot = {
+            "lsn": self._lsn,
+            "seq": self._seq,
+            "jobs": {str(seq): rec for seq, rec in self._pending.items()},
+        }
+        tmp_path = self._snapshot_path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_path)
+        # the records up to the snapshot lsn are skipped on the recovery,
+        # so a crash before the truncation is harmless
+        self._log.close()
+        self._log = self._log_path.open("w", encoding="utf-8")
+        self._since_snapshot = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._log.closed:
+                self._compact()
+                self._log.close()
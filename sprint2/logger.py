@@ -1,6 +1,84 @@
 import logging
+from logging.handlers import QueueHandler
+from queue import Empty, SimpleQueue
+from threading import Thread
 
 
-logging.basicConfig(level=logging.INFO)
+__all__ = ["LogListener", "sched_logger", "setup_logging"]
+
 
 sched_logger = logging.getLogger("Scheduler/Logger")
+# a library leaves the configuration to the application, see setup_logging()
+sched_logger.addHandler(logging.NullHandler())
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Enqueues the records as they are, the listener formats them."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LogListener:
+    """Handles the queued records in a background thread, a batch per wakeup.
+
+    While started, the scheduler logger only puts its records to the queue,
+    they do not propagate to the handlers of the root logger either.
+    """
+
+    def __init__(self, *handlers: logging.Handler, batch_size: int = 256) -> None:
+        self._queue: SimpleQueue = SimpleQueue()
+        self._queue_handler = _DeferredQueueHandler(self._queue)
+        self._handlers = handlers
+        self._batch_size = batch_size
+        self._thread: None | Thread = None
+        self._propagate = True
+
+    def start(self) -> None:
+        self._thread = Thread(target=self._run, name="sprint2-logging", daemon=True)
+        self._thread.start()
+        self._propagate, sched_logger.propagate = sched_logger.propagate, False
+        sched_logger.addHandler(self._queue_handler)
+
+    def stop(self) -> None:
+        """Handle the records queued so far and stop the thread."""
+
+        sched_logger.removeHandler(self._queue_handler)
+        if self._thread is not None:
+            sched_logger.propagate = self._propagate
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        queue = self._queue
+        while True:
+            batch = [queue.get()]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(queue.get_nowait())
+                except Empty:
+                    break
+            for record in batch:
+                if record is None:
+                    return
+                for handler in self._handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+
+
+def setup_logging(
+    level: int = logging.INFO, *handlers: logging.Handler, batch_size: int = 256
+) -> LogListener:
+    """Send the scheduler logs through a queue to a background listener.
+
+    A log call only enqueues its record, the formatting and the I/O happen
+    in the listener thread. The handlers default to a stderr stream.
+    """
+
+    listener = LogListener(
+        *(handlers or (logging.StreamHandler(),)), batch_size=batch_size
+    )
+    sched_logger.setLevel(level)
+    listener.start()
+    return listener
@@ -0,0 +1,164 @@
+import os
+from bisect import bisect_left
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, Callable
+
+
+__all__ = ["Counter", "Gauge", "Histogram", "MetricsExporter", "MetricsRegistry"]
+
+
+class Counter:
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+class Gauge:
+    """A current value, read from the callback if there is one."""
+
+    def __init__(self, fn: None | Callable[[], float] = None) -> None:
+        self._fn = fn
+        self._value = 0.0
+
+    @property
+    def value(self) -> float:
+        return self._value if self._fn is None else self._fn()
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+
+# from 10 us to ~3 min, doubling
+_DEFAULT_BOUNDS = tuple(1e-5 * 2**i for i in range(25))
+
+
+class Histogram:
+    """Counts the observed values by fixed buckets, an observation is O(log b).
+
+    The quantiles are estimated by the upper bounds of the buckets.
+    """
+
+    def __init__(self, bounds: tuple[float, ...] = _DEFAULT_BOUNDS) -> None:
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, num in zip(self.bounds, self.buckets):
+            seen += num
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class MetricsRegistry:
+    """Named counters, gauges and histograms.
+
+    The updates are plain attribute writes without locks, cheap enough for
+    the hot paths; the readers may see a value a step behind.
+    """
+
+    def __init__(self, prefix: str = "") -> None:
+        self._prefix = prefix
+        self._counters: dict[str, Counter] = {}
+        self._gauges: dict[str, Gauge] = {}
+        self._histograms: dict[str, Histogram] = {}
+
+    def counter(self, name: str) -> Counter:
+        return self._counters.setdefault(self._prefix + name, Counter())
+
+    def gauge(self, name: str, fn: None | Callable[[], float] = None) -> Gauge:
+        return self._gauges.setdefault(self._prefix + name, Gauge(fn))
+
+    def histogram(self, name: str) -> Histogram:
+        return self._histograms.setdefault(self._prefix + name, Histogram())
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "counters": {name: c.value for name, c in self._counters.items()},
+            "gauges": {name: g.value for name, g in self._gauges.items()},
+            "histograms": {name: h.summary() for name, h in self._histograms.items()},
+        }
+
+    def to_text(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+
+        lines = []
+        for name, counter in self._counters.items():
+            lines += [f"# TYPE {name} counter", f"{name} {counter.value}"]
+        for name, gauge in self._gauges.items():
+            lines += [f"# TYPE {name} gauge", f"{name} {gauge.value}"]
+        for name, hist in self._histograms.items():
+            lines.append(f"# TYPE {name} histogram")
+            seen = 0
+            for bound, num in zip(hist.bounds, hist.buckets):
+                seen += num
+                lines.append(f'{name}_bucket{{le="{bound:g}"}} {seen}')
+            lines.append(f'{name}_bucket{{le="+Inf"}} {hist.count}')
+            lines += [f"{name}_sum {hist.sum}", f"{name}_count {hist.count}"]
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Dumps the registry in the text format to a file every `interval` s.
+
+    The file is replaced atomically, so a reader never sees a partial dump.
+    """
+
+    def __init__(
+        self, registry: MetricsRegistry, path: str | Path, interval: float = 10.0
+    ) -> None:
+        self._registry = registry
+        self._path = Path(path)
+        self._interval = interval
+        self._stopped = Event()
+        self._thread: None | Thread = None
+        self._lock = Lock()
+
+    def export(self) -> None:
+        with self._lock:
+            tmp_path = self._path.with_suffix(".tmp")
+            tmp_path.write_text(self._registry.to_text(), encoding="utf-8")
+            os.replace(tmp_path, self._path)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            self.export()
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self._thread = Thread(target=self._run, name="sprint2-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.export()  # the final values
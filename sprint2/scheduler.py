@@ -1,20 +1,57 @@
-from collections import deque
+import heapq
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future
+from concurrent.futures import wait as wait_futures
+from datetime import datetime
 from enum import Enum
-from typing import Generator
-from threading import RLock
+from itertools import count, islice
+from typing import Any, Callable, Generator, Hashable, Iterable, Iterator, Mapping
+from threading import Lock, RLock
 
-from pydantic import BaseModel, NonNegativeInt
+from pydantic import (
+    BaseModel,
+    NonNegativeFloat,
+    NonNegativeInt,
+    PositiveFloat,
+    PositiveInt,
+    ValidationError,
+)
 
-from sprint2.aiotools import async_gather, gather, Coroutine
-from sprint2.jobtools.job import Job, JobError, validate_job_type
+from sprint2.aiotools import Coroutine, Loop, Task, TimerHeap, run_until_complete
+from sprint2.aiotools.timers import monotonic
+from sprint2.jobtools.cancel import CancelToken
+from sprint2.jobtools.executors import make_executor
+from sprint2.jobtools.job import (
+    Job,
+    JobError,
+    JobCancelledError,
+    JobExecutor,
+    JobExpiredError,
+    validate_job_type,
+)
+from sprint2.jobtools.queue import Capacity, OverflowPolicy, ReadyQueue
 from sprint2.jobtools.runners import async_run_job
+from sprint2.journal import Journal, JournalError, JournalOp
+from sprint2.metrics import MetricsRegistry
 from sprint2.logger import sched_logger
 
 
+# the cancelled jobs remembered for status(), the oldest ones forgotten
+_MAX_TOMBSTONES = 1024
+
+
 class SchedulerError(Exception):
     pass
 
 
+def _is_created(task: "JobTask") -> bool:
+    return task.state == JobTaskStatus.CREATED
+
+
+def _call_chunk(fn: Callable, chunk: tuple[tuple[Any, ...], ...]) -> list:
+    return [fn(*args) for args in chunk]
+
+
 class JobTaskStatus(str, Enum):
     CREATED = "CREATED"
     CANCELLED = "CANCELLED"
@@ -23,11 +60,78 @@ class JobTaskStatus(str, Enum):
 
 
 class JobTask:
-    def __init__(self, job: Job):
+    def __init__(
+        self,
+        job: Job,
+        dependencies: None | list["JobTask"] = None,
+        executors: None | Mapping[JobExecutor, Executor] = None,
+        on_retry: None | Callable[["JobTask"], None] = None,
+    ):
         validate_job_type(job)
         self.job = job
-        self.coro: Coroutine = async_run_job(job)
+        # without dependency tasks the runner runs the dependencies itself
+        self.deps = dependencies or []
+        self.dependents: list[JobTask] = []  # the reverse edges
+        self.indegree = 0  # the number of unfinished dependencies
+        self.pushed: list[int] = []  # the ids of the pushed jobs it runs
+        self.key: Hashable = None
+        self.nid = 0
+        self.aliases: list[Job] = []  # the equal dependencies sharing the node
+        self.priority = job.priority  # raised to the priorities of dependants
+        self.seqs: list[int] = []  # the journal numbers of the pushed aliases
+        self.future: Future = Future()
+        self.token = CancelToken()
+        self.coro: Coroutine = async_run_job(
+            job,
+            dependencies=(
+                None if dependencies is None else [dep.future for dep in dependencies]
+            ),
+            executors=executors,
+            on_retry=None if on_retry is None else lambda _: on_retry(self),
+            token=self.token,
+        )
         self.state = JobTaskStatus.CREATED
+        self.loop_task: None | Task = None
+        self.queued_at = 0.0  # when it became ready, on the monotonic clock
+        self.started_at = 0.0
+
+    def get_deadline_key(self) -> None | float:
+        if self.job.by_deadline and (deadline := self.job.get_deadline()):
+            return deadline.timestamp()
+        return None
+
+    def result(self) -> Any:
+        if (exc := self.future.exception()) is not None:
+            return exc
+        return self.future.result()
+
+
+class _SchedMetrics:
+    """The scheduler instruments, the gauges are read from it on demand."""
+
+    def __init__(self, registry: MetricsRegistry, sched: "Scheduler") -> None:
+        self.pushed = registry.counter("sched_jobs_pushed")
+        self.started = registry.counter("sched_jobs_started")
+        self.finished = registry.counter("sched_jobs_finished")
+        self.failed = registry.counter("sched_jobs_failed")
+        self.retried = registry.counter("sched_jobs_retried")
+        self.cancelled = registry.counter("sched_jobs_cancelled")
+        self.dropped = registry.counter("sched_jobs_dropped")
+        self.expired = registry.counter("sched_jobs_expired")
+        self.wait_time = registry.histogram("sched_wait_seconds")
+        self.run_time = registry.histogram("sched_run_seconds")
+        self.step_time = registry.histogram("sched_step_seconds")
+        # the registry may be read without the scheduler, count the inbox too
+        registry.gauge(
+            "sched_pending_jobs", lambda: len(sched._pushed) + len(sched._inbox)
+        )
+        registry.gauge("sched_unfinished_jobs", lambda: len(sched._capacity))
+        registry.gauge("sched_ready_nodes", lambda: sum(map(_is_created, sched._roots)))
+        registry.gauge("sched_running_nodes", lambda: len(sched._running))
+        registry.gauge(
+            "sched_slot_utilization",
+            lambda: len(sched._running) / sched._psize if sched._psize else 0.0,
+        )
 
 
 class Scheduler:
@@ -35,79 +139,732 @@ class Scheduler:
 
     class _SchedInfo(BaseModel):
         pool_size: NonNegativeInt
+        aging: None | PositiveFloat = None
+        max_jobs: None | PositiveInt = None
+        overflow: OverflowPolicy = OverflowPolicy.BLOCK
+        push_timeout: None | NonNegativeFloat = None
+        watermarks: None | tuple[NonNegativeInt, NonNegativeInt] = None
+
+    def __init__(
+        self,
+        pool_size: NonNegativeInt = 10,
+        journal: None | Journal = None,
+        aging: None | PositiveFloat = None,
+        metrics: None | MetricsRegistry = None,
+        max_jobs: None | PositiveInt = None,
+        overflow: OverflowPolicy | str = OverflowPolicy.BLOCK,
+        push_timeout: None | NonNegativeFloat = None,
+        watermarks: None | tuple[NonNegativeInt, NonNegativeInt] = None,
+        on_high_watermark: None | Callable[[], None] = None,
+        on_low_watermark: None | Callable[[], None] = None,
+    ):
+        """Create a scheduler running up to `pool_size` jobs at once.
+
+        The ready jobs are started by their priority; with `aging` a waiting
+        job gains one priority level per `aging` seconds, so low priority
+        jobs are not starved. The metrics go to the given registry, or to a
+        private one; see stats().
 
-    def __init__(self, pool_size: NonNegativeInt = 10):
-        self._psize: int = self._SchedInfo(pool_size=pool_size).pool_size
-        self._jobs: deque[Job] = deque()
-        self._tasks: deque[JobTask] = deque()
+        At most `max_jobs` pushed jobs may be unfinished, a push over it is
+        handled by the `overflow` policy: it blocks up to `push_timeout`
+        seconds, raises, or drops a queued job not started yet. The
+        watermark callbacks are called when the number of the unfinished
+        jobs reaches the high mark of `watermarks` (low, high) and when it
+        falls back to the low one.
+        """
+
+        try:
+            info = self._SchedInfo(
+                pool_size=pool_size,
+                aging=aging,
+                max_jobs=max_jobs,
+                overflow=OverflowPolicy(overflow),
+                push_timeout=push_timeout,
+                watermarks=watermarks,
+            )
+            self._capacity = Capacity(
+                info.max_jobs, info.watermarks, on_high_watermark, on_low_watermark
+            )
+        except (ValidationError, ValueError) as e:
+            raise SchedulerError(str(e)) from e
+        self._overflow = info.overflow
+        self._push_timeout = info.push_timeout
+        self._psize: int = info.pool_size
+        # the pushed jobs in push order: job id -> (push number, job, node)
+        self._pushed: OrderedDict[int, tuple[int, Job, JobTask]] = OrderedDict()
+        self._push_nums = count()
+        # the pushed jobs whose nodes have not started, the drop candidates
+        self._queued: OrderedDict[int, Job] = OrderedDict()
+        self._by_priority: list[tuple[int, int, int]] = []  # a lazy heap
+        self._done: list[JobTask] = []  # the finished nodes not collected yet
+        self._to_cancel: list[JobTask] = []  # handed over to the loop thread
+        # the producers only append here, the jobs are admitted in batches
+        self._inbox: deque[Job] = deque()
+        self._inboxed: set[int] = set()  # the ids of the jobs in the inbox
+        self._ids_lock = Lock()
         self._lock = RLock()
+        self._driver = Lock()  # held by the thread running the loop
+        self._loop = Loop()
+        self._running: dict[Task, JobTask] = {}
+        # the DAG: equal dependencies share one node and its memoized result,
+        # a pushed job gets its own one, pushing it again means to run again;
+        # the nodes without unfinished dependencies wait in the roots queue
+        self._nodes: dict[Hashable, JobTask] = {}
+        self._aliases: dict[int, JobTask] = {}  # id(job) -> node
+        self._roots: ReadyQueue[JobTask] = ReadyQueue(aging=info.aging)
+        # the nodes with a start in the future wait here instead of a slot
+        self._delayed: TimerHeap[JobTask] = TimerHeap()
+        self._nids = count()
+        # the running nodes by their deadlines, cancelled when these pass
+        self._deadlines: TimerHeap[Task] = TimerHeap()
+        # workers are started lazily, on the first submitted job
+        self._executors: dict[JobExecutor, Executor] = {
+            mode: make_executor(mode, max_workers=max(self._psize, 1))
+            for mode in (JobExecutor.THREAD, JobExecutor.PROCESS)
+        }
+        self._journal = journal
+        self._seqs: dict[int, int] = {}  # job id -> journal number
+        self._tombstones: OrderedDict[int, None] = OrderedDict()
+        self._stopping = False
+        self.metrics = MetricsRegistry() if metrics is None else metrics
+        self._m = _SchedMetrics(self.metrics, self)
+        if journal is not None:
+            self._restore(journal)
+
+    def _restore(self, journal: Journal) -> None:
+        restored = journal.pending()
+        self._capacity.reserve(len(restored), force=True)
+        with self._lock:
+            for seq, job in restored:
+                self._seqs[job.id] = seq
+                self._push_task(job)
+        if restored:
+            sched_logger.info("%s jobs are restored from the journal", len(restored))
+
+    def _journal_task(self, task: JobTask, op: JournalOp) -> None:
+        if self._journal is not None:
+            for seq in task.seqs:
+                self._journal.append(op, seq)
 
     def __len__(self) -> int:
-        return len(self._jobs)
+        with self._lock:
+            self._admit_inbox()
+            return len(self._pushed)
+
+    def stats(self) -> dict[str, Any]:
+        """Return the counters, the gauges and the latency summaries.
+
+        The wait time is counted from a node getting ready to its start.
+        The inbox is admitted first, so the gauges cover the pushed jobs.
+        """
+
+        with self._lock:
+            self._admit_inbox()
+            return self.metrics.snapshot()
 
     def pop(self) -> Job:
+        """Take back the earliest pushed job, it must not be started yet."""
+
         with self._lock:
+            self._admit_inbox()
             try:
-                job = self._jobs[0]
-            except IndexError:
+                _, job, task = next(iter(self._pushed.values()))
+            except StopIteration:
                 msg = "pop a job from an empty scheduler"
+                raise SchedulerError(msg) from None
+            if (s := task.state) != JobTaskStatus.CREATED:
+                msg = f"the {job} with status {s} is unschedulable"
+                sched_logger.error(msg)
                 raise SchedulerError(msg)
-            self._unschedule(job)
-            return self._jobs.popleft()
+            sched_logger.info("the %s is unscheduled", job)
+            self._unpush(job, task, JournalOp.POPPED)
+            self._release(task)
+            return job
+
+    def status(self, job_id: int) -> None | JobTaskStatus:
+        """Return the status of the pushed job, None if there is no such job.
+
+        A cancelled or dropped job is CANCELLED, for a while after it is gone.
+        """
 
-    def _pop_task(self) -> None | JobTask:
         with self._lock:
-            if len(self._tasks):
-                return self._tasks.popleft()
-            return None
+            self._admit_inbox()
+            if (entry := self._pushed.get(job_id)) is None:
+                if job_id in self._tombstones:
+                    return JobTaskStatus.CANCELLED
+                return None
+            return entry[2].state
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel the pushed job, return False if there is no such job.
+
+        A job not started yet is dropped along with the dependencies nobody
+        else needs. A running one gets JobCancelledError thrown into its
+        coroutine, unless a dependant needs its result.
+        """
 
-    def push(self, job: Job) -> None:
         with self._lock:
-            try:
+            self._admit_inbox()
+            if (entry := self._pushed.get(job_id)) is None:
+                return False
+            self._cancel(*entry[1:])
+            self._m.cancelled.inc()
+        self._loop.notify()
+        return True
+
+    def _cancel(self, job: Job, task: JobTask) -> None:
+        self._unpush(job, task, JournalOp.CANCELLED)
+        self._tombstones[job.id] = None
+        if len(self._tombstones) > _MAX_TOMBSTONES:
+            self._tombstones.popitem(last=False)
+        if task.state == JobTaskStatus.CREATED:
+            self._release(task)
+        elif task.state == JobTaskStatus.RUNNING and not (
+            task.pushed or task.dependents
+        ):
+            task.state = JobTaskStatus.CANCELLED
+            task.token.cancel()
+            self._to_cancel.append(task)
+
+    def _unpush(self, job: Job, task: JobTask, op: JournalOp) -> None:
+        del self._pushed[job.id]
+        self._queued.pop(job.id, None)
+        self._compact_by_priority()
+        task.pushed.remove(job.id)
+        if not task.future.done():  # else released on finishing
+            self._capacity.release(1)
+        if (seq := self._seqs.pop(job.id, None)) is not None:
+            task.seqs.remove(seq)
+            if self._journal is not None:
+                self._journal.append(op, seq)
+
+    def push(self, job: Job) -> None:
+        self.push_many([job])
+
+    def push_many(self, jobs: Iterable[Job]) -> None:
+        """Push the jobs, safe to call from many threads at once.
+
+        A producer does not take the scheduler lock: the jobs go to an inbox
+        the loop thread admits in batches (or any call needing the jobs,
+        like len(), admits first), and the loop is woken up. With a journal
+        the jobs are written to it before this returns; if it fails on a
+        job, the jobs before it stay pushed. A bounded scheduler may block,
+        raise, or drop jobs here, see the overflow policies.
+        """
+
+        jobs = list(jobs)
+        try:
+            for job in jobs:
                 validate_job_type(job)
-            except JobError as e:
-                raise SchedulerError(str(e)) from e
-            self._jobs.append(job)
+        except JobError as e:
+            raise SchedulerError(str(e)) from e
+        ids = {job.id for job in jobs}
+        with self._ids_lock:
+            # an admitted job is in the pushed jobs before it leaves the inbox
+            if len(ids) < len(jobs) or any(
+                job_id in self._inboxed or job_id in self._pushed for job_id in ids
+            ):
+                msg = "a job is pushed twice, push an equal job instead"
+                raise SchedulerError(msg)
+            self._inboxed |= ids
+        capacity, policy = self._capacity, self._overflow
+        if capacity.limit is None or policy in (
+            OverflowPolicy.BLOCK,
+            OverflowPolicy.RAISE,
+        ):
+            try:
+                self._reserve(jobs)
+            except BaseException:
+                self._forget(jobs)
+                raise
+            self._send(jobs)
+            return
+        # one by one, a job may make room by dropping the ones before it
+        for job in jobs:
+            while not capacity.reserve(1, block=False):
+                if not self._evict(job.priority):
+                    self._m.dropped.inc()
+                    sched_logger.warning("the %s is dropped, the queue is full", job)
+                    self._forget([job])
+                    break
+            else:
+                self._send([job])
+
+    def _reserve(self, jobs: list[Job]) -> None:
+        capacity = self._capacity
+        if capacity.limit is not None and len(jobs) > capacity.limit:
+            msg = f"{len(jobs)} jobs are more than the limit {capacity.limit}"
+            raise SchedulerError(msg)
+        block = self._overflow is OverflowPolicy.BLOCK
+        if not capacity.reserve(len(jobs), block, self._push_timeout):
+            msg = f"the scheduler is full: {capacity.limit} unfinished jobs"
+            raise SchedulerError(msg)
+
+    def _send(self, jobs: list[Job]) -> None:
+        """Journal the jobs with reserved room and put them to the inbox."""
+
+        if self._journal is not None:
+            for num, job in enumerate(jobs):
+                seq = self._journal.next_seq()
+                try:
+                    self._journal.append(JournalOp.PUSHED, seq, job)
+                except JournalError as e:
+                    self._capacity.release(len(jobs) - num)
+                    self._forget(jobs[num:])
+                    self._inbox.extend(jobs[:num])
+                    self._loop.notify()
+                    raise SchedulerError(str(e)) from e
+                self._seqs[job.id] = seq
+        self._inbox.extend(jobs)
+        self._loop.notify()  # a running loop may have free slots for them
+
+    def _forget(self, jobs: list[Job]) -> None:
+        with self._ids_lock:
+            self._inboxed.difference_update(job.id for job in jobs)
+
+    def _evict(self, priority: int) -> bool:
+        """Drop a queued job to make room for a job with the priority."""
+
+        with self._lock:
+            self._admit_inbox()
+            if self._overflow is OverflowPolicy.DROP_OLDEST:
+                job_id = next(iter(self._queued), None)
+            else:
+                heap = self._by_priority
+                while heap and heap[0][2] not in self._queued:
+                    heapq.heappop(heap)
+                job_id = None
+                if heap and heap[0][0] < priority:
+                    job_id = heapq.heappop(heap)[2]
+            if job_id is None:
+                return False
+            _, job, task = self._pushed[job_id]
+            self._cancel(job, task)
+            self._m.dropped.inc()
+            sched_logger.warning("the %s is dropped, the queue is full", job)
+            return True
+
+    def _admit_inbox(self) -> None:
+        inbox, admitted = self._inbox, []
+        while inbox:
+            job = inbox.popleft()
             self._push_task(job)
+            admitted.append(job)
+        self._forget(admitted)
+        self._m.pushed.inc(len(admitted))
+
+    def map(
+        self,
+        fn: Callable,
+        args_iterable: Iterable[Iterable[Any]],
+        chunksize: int = 1,
+        **options: Any,
+    ) -> Iterator:
+        """Push fn(*args) calls, `chunksize` of them per job, stream the results.
+
+        The results come in the order of the args. If nobody runs the
+        scheduler, the iterator runs it until the next chunk is done. A chunk
+        job is forgotten once its results are yielded; run() does not return
+        it. The options are passed to every chunk job, see Job.
+
+        A bounded scheduler gets only the chunks there is room for, the rest
+        are pushed as the results are consumed, whatever the overflow policy.
+        """
+
+        if isinstance(chunksize, bool) or not isinstance(chunksize, int):
+            raise SchedulerError(f"the chunk size must be an integer: {chunksize}")
+        if chunksize < 1:
+            raise SchedulerError(f"the chunk size must be positive: {chunksize}")
+        items = iter(args_iterable)
+        chunks = iter(lambda: tuple(map(tuple, islice(items, chunksize))), ())
+        try:
+            jobs = Job.bulk(_call_chunk, ((fn, chunk) for chunk in chunks), **options)
+        except JobError as e:
+            raise SchedulerError(str(e)) from e
+        todo = deque(jobs)
+        pushed: deque[tuple[Job, Future]] = deque()
+        self._push_chunks(todo, pushed)
+        return self._iter_results(todo, pushed)
+
+    def _push_chunks(self, todo: deque[Job], pushed: deque[tuple[Job, Future]]) -> None:
+        """Push the chunk jobs while there is room, never block or drop."""
+
+        while todo:
+            job = todo[0]
+            with self._ids_lock:
+                self._inboxed.add(job.id)
+            if not self._capacity.reserve(1, block=False):
+                self._forget([job])
+                return
+            todo.popleft()
+            self._send([job])
+            with self._lock:
+                self._admit_inbox()
+                pushed.append((job, self._pushed[job.id][2].future))
+
+    def _iter_results(
+        self, todo: deque[Job], pushed: deque[tuple[Job, Future]]
+    ) -> Iterator:
+        while todo or pushed:
+            self._push_chunks(todo, pushed)
+            if not pushed:  # the room is taken by the other jobs
+                self._wait_for_room()
+                continue
+            job, future = pushed.popleft()
+            if not future.done():
+                self._run_until(future)
+            if not future.done():
+                msg = "the job is popped from the scheduler before its run"
+                raise SchedulerError(msg)
+            self._collect(job)
+            yield from future.result()
+
+    def _wait_for_room(self) -> None:
+        # the earliest unfinished job releases its room when it finishes
+        with self._lock:
+            self._admit_inbox()
+            unfinished = (
+                task.future
+                for _, _, task in self._pushed.values()
+                if not task.future.done()
+            )
+            future = next(unfinished, None)
+        if future is not None:
+            self._run_until(future)
+
+    def _collect(self, job: Job) -> None:
+        """Forget a finished pushed job, as if run() has returned it."""
+
+        with self._lock:
+            if (entry := self._pushed.pop(job.id, None)) is None:
+                return  # a service running forever has dropped it already
+            task = entry[2]
+            task.pushed.remove(job.id)
+            self._seqs.pop(job.id, None)
+            if not task.pushed and task in self._done:
+                self._done.remove(task)
+                self._drop_node(task)
+
+    def _run_until(self, future: Future) -> None:
+        if not self._driver.acquire(blocking=False):
+            wait_futures([future])  # another thread runs the loop
+            return
+        try:
+            run_until_complete(self._async_run(until=future))
+        finally:
+            self._driver.release()
 
     def _push_task(self, job: Job) -> None:
+        # every pushed job joins the DAG at once, the pool size only limits
+        # how many of its nodes are spawned on the loop at the same time
         with self._lock:
-            if len(self._tasks) < min(len(self), self._psize):
-                self._tasks.append(JobTask(job))
+            task = self._taskify(job)
+            task.pushed.append(job.id)
+            if (seq := self._seqs.get(job.id)) is not None:
+                task.seqs.append(seq)
+            num = next(self._push_nums)
+            self._pushed[job.id] = (num, job, task)
+            self._tombstones.pop(job.id, None)
+            if task.future.done():  # joined a finished node, not collected yet
+                self._capacity.release(1)
+            if task.state == JobTaskStatus.CREATED:
+                self._queued[job.id] = job
+                if self._overflow is OverflowPolicy.DROP_LOWEST:
+                    heapq.heappush(self._by_priority, (job.priority, num, job.id))
+
+    def _taskify(self, root: Job) -> JobTask:
+        """Add the job and its missing dependencies to the DAG."""
+
+        # an explicit stack, so deep chains do not hit the recursion limit
+        stack = [root]
+        while stack:
+            job = stack[-1]
+            if id(job) in self._aliases:
+                stack.pop()
+                continue
+            missing = [dep for dep in job.dependencies if id(dep) not in self._aliases]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            deps = [self._aliases[id(dep)] for dep in job.dependencies]
+            self._add_node(job, deps, shared=job is not root)
+        return self._aliases[id(root)]
+
+    def _add_node(self, job: Job, deps: list[JobTask], shared: bool = True) -> None:
+        key = (job.key, tuple(dep.nid for dep in deps)) if shared else job.id
+        if (task := self._nodes.get(key)) is None:
+            task = JobTask(job, deps, self._executors, self._on_retry)
+            task.key, task.nid = key, next(self._nids)
+            self._nodes[key] = task
+            for dep in deps:
+                dep.dependents.append(task)
+                if dep.state != JobTaskStatus.FINISHED:
+                    task.indegree += 1
+            if not task.indegree:
+                self._enqueue(task)
+            self._inherit_priority(deps, task.priority)
+        elif job.priority > task.priority:
+            self._inherit_priority([task], job.priority)
+        self._aliases[id(job)] = task
+        task.aliases.append(job)
+
+    def _enqueue(self, task: JobTask) -> None:
+        start = task.job.start
+        if (
+            start is not None
+            and (delay := (start - datetime.now()).total_seconds()) > 0
+        ):
+            self._delayed.push(monotonic() + delay, task)
+            return
+        self._make_ready(task)
+
+    def _make_ready(self, task: JobTask) -> None:
+        if not task.queued_at:
+            task.queued_at = monotonic()
+        self._roots.push(task, task.priority, task.get_deadline_key())
+
+    def _ready_delayed(self) -> None:
+        for task in self._delayed.pop_due():
+            if task.state == JobTaskStatus.CREATED:  # not popped or cancelled
+                self._make_ready(task)
+
+    def _has_delayed(self) -> bool:
+        return any(map(_is_created, self._delayed))
+
+    def _next_wakeup(self) -> None | float:
+        wakeups = [self._deadlines.earliest(), self._delayed.earliest()]
+        return min((w for w in wakeups if w is not None), default=None)
+
+    def _inherit_priority(self, tasks: list[JobTask], priority: int) -> None:
+        """Raise the priority of the nodes and of the nodes they depend on."""
+
+        stack = list(tasks)
+        while stack:
+            task = stack.pop()
+            if task.priority >= priority or task.state != JobTaskStatus.CREATED:
+                continue
+            task.priority = priority
+            if not task.indegree:  # the entry with the old priority goes stale
+                self._enqueue(task)
+            stack.extend(task.deps)
+
+    def _drop_node(self, task: JobTask) -> None:
+        del self._nodes[task.key]
+        for job in task.aliases:
+            del self._aliases[id(job)]
+
+    def _release(self, task: JobTask) -> None:
+        """Drop the node and its dependencies nobody needs any more."""
+
+        stack = [task]
+        while stack:
+            task = stack.pop()
+            if task.pushed or task.dependents or task.state != JobTaskStatus.CREATED:
+                continue
+            task.state = JobTaskStatus.CANCELLED
+            task.coro.close()
+            self._drop_node(task)
+            for dep in task.deps:
+                dep.dependents.remove(task)
+                stack.append(dep)
+        # the dropped nodes stay in the queues until popped, purge them in bulk
+        if len(self._roots) > 2 * len(self._nodes) + 64:
+            self._roots.retain(_is_created)
+        if len(self._delayed) > 2 * len(self._nodes) + 64:
+            self._delayed.retain(_is_created)
+
+    def _flush_finished_tasks(self) -> list:
+        """Forget the finished pushed jobs, return their results in push order."""
 
-    def _unschedule(self, job: Job) -> None:
-        task_to_unsched = None
+        return [res for _, res in self._collect_finished()]
+
+    def _collect_finished(self) -> list[tuple[Job, Any]]:
+        # only the nodes finished since the last call are visited
         with self._lock:
-            for task in self._tasks:
-                if task.job is job:
-                    task_to_unsched = task
+            done, self._done = self._done, []
+            entries = []
+            for task in done:
+                entries += [self._pushed.pop(job_id) for job_id in task.pushed]
+                self._drop_node(task)
+            entries.sort(key=lambda entry: entry[0])
+            for _, job, _ in entries:
+                self._seqs.pop(job.id, None)
+            return [(job, task.result()) for _, job, task in entries]
+
+    def _spawn_roots(self) -> None:
+        """Fill the free pool slots with the nodes ready to run."""
+
+        roots = self._roots
+        while roots and len(self._running) < self._psize and not self._stopping:
+            task = roots.pop()
+            if task.state == JobTaskStatus.CREATED:
+                task.state = JobTaskStatus.RUNNING
+                for job_id in task.pushed:
+                    self._queued.pop(job_id, None)
+                task.started_at = monotonic()
+                self._m.started.inc()
+                self._m.wait_time.observe(task.started_at - task.queued_at)
+                loop_task = task.loop_task = self._loop.spawn(task.coro)
+                self._running[loop_task] = task
+                self._journal_task(task, JournalOp.STARTED)
+                self._arm_deadline(task, loop_task)
+        self._compact_by_priority()
+
+    def _compact_by_priority(self) -> None:
+        # the started and dropped jobs leave stale entries, an overflow only
+        # pops those on top, so rebuild once they outnumber the live ones
+        heap = self._by_priority
+        if len(heap) > 2 * len(self._queued) + 64:
+            heap[:] = [entry for entry in heap if entry[2] in self._queued]
+            heapq.heapify(heap)
+
+    def _arm_deadline(self, task: JobTask, loop_task: Task) -> None:
+        # the duration counts from now, the runner keeps the token deadline
+        now = datetime.now()
+        if (deadline := task.job.get_deadline(started=now)) is not None:
+            task.token.deadline = deadline
+            timeout = (deadline - now).total_seconds()
+            self._deadlines.push(monotonic() + timeout, loop_task)
+
+    def _cancel_expired(self) -> None:
+        """Throw into the running nodes past their deadlines."""
+
+        for loop_task in self._deadlines.pop_due():
+            if (task := self._running.get(loop_task)) is not None:
+                msg = f"the {task.job} is expired"
+                self._m.expired.inc()
+                self._loop.cancel(loop_task, JobExpiredError(msg))
+
+    def _cancel_requested(self) -> None:
+        to_cancel, self._to_cancel = self._to_cancel, []
+        for task in to_cancel:
+            if task.loop_task in self._running:
+                msg = f"the {task.job} is cancelled"
+                self._loop.cancel(task.loop_task, JobCancelledError(msg))
+
+    def _finish(self, loop_task: Task) -> None:
+        task = self._running.pop(loop_task)
+        self._m.run_time.observe(monotonic() - task.started_at)
+        # a finished task stays in the deadlines heap with its result until
+        # its deadline passes, drop such ones once they outnumber the running
+        if len(self._deadlines) > 2 * len(self._running) + 16:
+            self._deadlines.retain(self._running.__contains__)
+        if loop_task.exc is None:
+            task.future.set_result(loop_task.res)
+            self._journal_task(task, JournalOp.FINISHED)
+            self._m.finished.inc()
+        else:
+            task.future.set_exception(loop_task.exc)
+            self._journal_task(task, JournalOp.FAILED)
+            self._m.failed.inc()
+        if task.state == JobTaskStatus.RUNNING:  # a cancelled one stays so
+            task.state = JobTaskStatus.FINISHED
+        self._capacity.release(len(task.pushed))
+        self._done.append(task)
+        for dependant in task.dependents:
+            dependant.indegree -= 1
+            if not dependant.indegree:
+                self._enqueue(dependant)
+
+    def _on_retry(self, task: JobTask) -> None:
+        self._m.retried.inc()
+        self._journal_task(task, JournalOp.RETRIED)
+
+    def shutdown(self, wait: bool = True) -> None:
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait)
+        self._loop.close()
+        if self._journal is not None:
+            self._journal.close()
+
+    def stop(self) -> None:
+        """Let the running jobs finish and make run() return.
+
+        The jobs not started yet stay in the scheduler (and in its journal).
+        """
+
+        self._stopping = True
+        self._loop.notify()
+
+    def run(self, forever: bool = False) -> list:
+        """Run until the scheduler is drained, or until stop() if forever.
+
+        The results of the finished pushed jobs are returned in push order,
+        a service running forever drops them as it goes.
+        """
+
+        return run_until_complete(self.async_step(forever=forever))
+
+    def async_step(self, forever: bool = False) -> Generator[Any, None, list]:
+        if not self._driver.acquire(blocking=False):
+            msg = "the scheduler is already run by another thread"
+            raise SchedulerError(msg)
+        try:
+            return (yield from self._async_run(forever=forever))
+        finally:
+            self._driver.release()
+
+    def iter_results(self) -> Iterator[tuple[Job, Any]]:
+        """Run the scheduler, yield (job, result or exception) as jobs finish.
+
+        The jobs finished in the same loop step come in push order. A job is
+        forgotten once it is yielded; run() does not return it any more.
+        Closing the iterator leaves the unfinished jobs in the scheduler.
+        """
+
+        if not self._driver.acquire(blocking=False):
+            msg = "the scheduler is already run by another thread"
+            raise SchedulerError(msg)
+        sink: deque[tuple[Job, Any]] = deque()
+        loop = Loop()
+        try:
+            loop.spawn(self._async_run(sink=sink))
+            while loop:
+                loop.run_ready()
+                while sink:
+                    yield sink.popleft()
+                loop.park()
+        finally:
+            loop.close()
+            self._driver.release()
+
+    def _async_run(
+        self,
+        forever: bool = False,
+        until: None | Future = None,
+        sink: None | deque[tuple[Job, Any]] = None,
+    ) -> Generator[Any, None, list]:
+        loop = self._loop
+        try:
+            while True:
+                if until is not None and until.done():
+                    return []  # the results are left for run()
+                with self._lock:
+                    self._admit_inbox()
+                    self._ready_delayed()
+                    self._spawn_roots()
+                    drained = not loop and (
+                        self._stopping
+                        or not self._psize
+                        or not (forever or self._has_delayed())
+                    )
+                if drained:
                     break
-            if t := task_to_unsched:
-                if (s := t.state) != JobTaskStatus.CREATED:
-                    msg = f"the {job} with status {s} is unschedulable"
-                    sched_logger.exception(msg)
-                    raise SchedulerError(msg)
-                msg = f"the {job} is unscheduled"
-                sched_logger.info(msg)
-                self._tasks.remove(task_to_unsched)
-
-    def _flush_taskified_jobs(self):
-        with self._lock:
-            while self._tasks:
-                task = self._pop_task()
-                self._jobs.remove(task.job)
-                task.coro.close()
-
-    def run(self) -> list:
-        res: list[list] = gather(self.async_step())
-        return res.pop()
-
-    def async_step(self) -> Generator:
-        runners = [task.coro for task in self._tasks]
-        waiter = async_gather(*runners, return_exceptions=True)
-        while True:
-            try:
-                yield next(waiter)
-            except StopIteration as result:
-                self._flush_taskified_jobs()
-                return result.value
+                yield loop.idle_request(self._next_wakeup())
+                step_start = monotonic()
+                with self._lock:
+                    self._cancel_expired()
+                    self._cancel_requested()
+                finished = loop.run_ready()
+                with self._lock:
+                    for loop_task in finished:
+                        self._finish(loop_task)
+                    if sink is not None and finished:
+                        sink.extend(self._collect_finished())
+                    elif forever and finished:
+                        self._flush_finished_tasks()
+                self._m.step_time.observe(monotonic() - step_start)
+        finally:
+            self._stopping = False
+        return self._flush_finished_tasks()
@@ -0,0 +1,18 @@
+from sprint2.aiotools import as_completed, async_sleep
+
+
+def _sleepy(seconds: float) -> float:
+    yield from async_sleep(seconds)
+    if not seconds:
+        raise ValueError(seconds)
+    return seconds
+
+
+def test_as_completed_yields_in_completion_order():
+    aws = [_sleepy(0.03), _sleepy(0.01), _sleepy(0), _sleepy(0.02)]
+
+    done = list(as_completed(*aws))
+
+    assert [aw for aw, _ in done] == [aws[2], aws[1], aws[3], aws[0]]
+    assert isinstance(done[0][1], ValueError)
+    assert [res for _, res in done[1:]] == [0.01, 0.02, 0.03]
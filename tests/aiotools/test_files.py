@@ -0,0 +1,114 @@
+import mmap
+import os
+from hashlib import sha256
+
+import pytest
+
+from sprint2.aiotools import (
+    ChunkReader,
+    ChunkWriter,
+    MmapReader,
+    async_copy_file,
+    async_process_file,
+    async_sleep,
+    wait,
+)
+from sprint2.jobtools import Job
+from sprint2.scheduler import Scheduler
+
+
+@pytest.fixture()
+def big_file(tmp_path):
+    path = tmp_path / "big.bin"
+    path.write_bytes(os.urandom(1000) * 1000)
+    return path
+
+
+def _read_all(reader):
+    chunks, buffers = [], set()
+    while chunk := (yield from reader.async_read_chunk()):
+        chunks.append(bytes(chunk))
+        buffers.add(id(chunk.obj))
+    return chunks, buffers
+
+
+def test_chunk_reader_reuses_its_buffer(big_file):
+    with ChunkReader(big_file, chunk_size=300_000) as reader:
+        [(chunks, buffers)] = wait(_read_all(reader))
+
+    assert [len(chunk) for chunk in chunks] == [300_000] * 3 + [100_000]
+    assert b"".join(chunks) == big_file.read_bytes()
+    assert len(buffers) == 1
+
+
+def test_mmap_reader_does_not_copy(big_file):
+    with MmapReader(big_file, chunk_size=300_000) as reader:
+        assert len(reader) == 1_000_000
+        [(chunks, buffers)] = wait(_read_all(reader))
+
+    assert b"".join(chunks) == big_file.read_bytes()
+    with MmapReader(big_file) as reader:
+        chunk = wait(reader.async_read_chunk()).pop()
+        assert isinstance(chunk.obj, mmap.mmap)
+
+    empty = big_file.with_name("empty.bin")
+    empty.write_bytes(b"")
+    with MmapReader(empty) as reader:
+        assert wait(_read_all(reader)) == [([], set())]
+
+
+def test_files_are_processed_between_other_tasks(big_file, tmp_path):
+    steps = []
+    digest = sha256()
+
+    def _ticker():
+        for _ in range(5):
+            steps.append("tick")
+            yield
+
+    def _update(chunk: memoryview) -> None:
+        steps.append("chunk")
+        digest.update(chunk)
+
+    copy = tmp_path / "copy.bin"
+    results = wait(
+        async_process_file(big_file, _update, 100_000),
+        _ticker(),
+        async_copy_file(big_file, copy, 64 * 1024),
+    )
+
+    assert sorted(results, key=str) == [1_000_000, 1_000_000, None]
+    assert digest.digest() == sha256(big_file.read_bytes()).digest()
+    assert copy.read_bytes() == big_file.read_bytes()
+    assert "tick" in steps[steps.index("chunk") :]  # interleaved
+
+
+def test_chunk_writer(tmp_path):
+    path = tmp_path / "out.bin"
+    data = bytes(range(256)) * 1000
+
+    with ChunkWriter(path, chunk_size=10_000) as writer:
+        assert wait(writer.async_write(data)) == [len(data)]
+    with ChunkWriter(path, append=True) as writer:
+        wait(writer.async_write(b"end"))
+
+    assert path.read_bytes() == data + b"end"
+    with pytest.raises(ValueError):
+        ChunkWriter(path, chunk_size=0)
+
+
+def _hash_file(path):
+    digest = sha256()
+    yield from async_sleep(0)
+    yield from async_process_file(path, digest.update, 4096, use_mmap=True)
+    return digest.hexdigest()
+
+
+def test_file_jobs_in_scheduler(big_file):
+    sched = Scheduler(pool_size=2)
+    sched.push_many(Job(fn=_hash_file, args=[big_file]) for _ in range(2))
+
+    results = sched.run()
+    sched.shutdown()
+
+    assert results == [sha256(big_file.read_bytes()).hexdigest()] * 2
@@ -0,0 +1,160 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import sleep
+
+import pytest
+
+from sprint2.aiotools import ConnectionPool, HTTPError, wait
+
+
+class _Stats:
+    def __init__(self) -> None:
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = Lock()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stats: _Stats
+
+    def setup(self) -> None:
+        super().setup()
+        with self.stats.lock:
+            self.stats.connections += 1
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        with self.stats.lock:
+            self.stats.in_flight += 1
+            self.stats.max_in_flight = max(
+                self.stats.max_in_flight, self.stats.in_flight
+            )
+        try:
+            self._respond()
+        finally:
+            with self.stats.lock:
+                self.stats.in_flight -= 1
+
+    def _respond(self) -> None:
+        kind, _, arg = self.path.strip("/").partition("/")
+        if kind == "slow":
+            sleep(float(arg))
+        if kind == "chunked":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for num in range(int(arg)):
+                chunk = b"%d," % num
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        elif kind == "close":
+            self.send_response(200)
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(b"x" * int(arg))
+            self.close_connection = True
+        else:
+            body = b"xx" if kind == "slow" else b"x" * int(arg)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+@pytest.fixture()
+def server():
+    stats = _Stats()
+    handler = type("Handler", (_Handler,), {"stats": stats})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", stats
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _get(pool: ConnectionPool, url: str):
+    response = yield from pool.async_get(url)
+    return response.status, (yield from response.async_read())
+
+
+def test_keep_alive_connection_is_reused(server):
+    base, stats = server
+    pool = ConnectionPool()
+
+    for num in range(10):
+        assert wait(_get(pool, f"{base}/bytes/{num + 1}")) == [(200, b"x" * (num + 1))]
+    pool.close()
+
+    assert stats.connections == 1
+
+
+def test_per_host_limit(server):
+    base, stats = server
+    pool = ConnectionPool(max_per_host=3)
+
+    results = wait(*[_get(pool, f"{base}/slow/0.02") for _ in range(20)])
+    pool.close()
+
+    assert results == [(200, b"xx")] * 20
+    assert stats.max_in_flight <= 3
+    assert stats.connections <= 3
+
+
+def test_body_is_streamed_in_chunks(server):
+    base, _ = server
+    pool = ConnectionPool()
+    sizes = []
+
+    def _stream():
+        response = yield from pool.async_get(f"{base}/bytes/1000000")
+        while data := (yield from response.async_read_chunk(16384)):
+            sizes.append(len(data))
+        return response.done
+
+    assert wait(_stream()) == [True]
+    assert sum(sizes) == 1_000_000
+    assert max(sizes) <= 16384
+    pool.close()
+
+
+def test_chunked_and_close_delimited_bodies(server):
+    base, stats = server
+    pool = ConnectionPool()
+
+    urls = ["chunked/100", "close/5000", "bytes/3"]
+    results = [wait(_get(pool, f"{base}/{url}")).pop() for url in urls]
+    pool.close()
+
+    assert results == [
+        (200, b"".join(b"%d," % num for num in range(100))),
+        (200, b"x" * 5000),
+        (200, b"xxx"),
+    ]
+    assert stats.connections == 2
+
+
+def test_unread_response_frees_its_slot(server):
+    base, _ = server
+    pool = ConnectionPool(max_per_host=1, timeout=1)
+
+    def _abandon():
+        with (yield from pool.async_get(f"{base}/bytes/100000")) as response:
+            yield from response.async_read_chunk(10)
+        return (yield from _get(pool, f"{base}/bytes/1"))
+
+    assert wait(_abandon()) == [(200, b"x")]
+    pool.close()
+
+
+def test_bad_urls():
+    pool = ConnectionPool()
+
+    with pytest.raises(HTTPError):
+        wait(pool.async_get("https://example.com/"))
+    with pytest.raises(ValueError):
+        ConnectionPool(max_per_host=0)
@@ -0,0 +1,150 @@
+import socket
+from concurrent.futures import Future
+from threading import Timer
+from time import time
+
+import pytest
+
+from sprint2.aiotools import (
+    Loop,
+    async_accept,
+    async_connect,
+    async_recv,
+    async_result,
+    async_sendall,
+    async_sleep,
+    wait,
+    wait_readable,
+)
+
+
+@pytest.fixture()
+def server():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(512)
+    yield sock
+    sock.close()
+
+
+def _serve(server: socket.socket, clients: int):
+    # an echo server, its connections are served by the same loop
+    loop = Loop()
+    for _ in range(clients):
+        conn, _ = yield from async_accept(server, timeout=5)
+        loop.spawn(_echo(conn))
+    while loop:
+        loop.run_ready()
+        if loop:
+            yield loop.idle_request()
+    loop.close()
+
+
+def _echo(conn: socket.socket):
+    with conn:
+        while data := (yield from async_recv(conn, 1024, timeout=5)):
+            yield from async_sendall(conn, data, timeout=5)
+
+
+def _client(address, num: int):
+    with socket.socket() as sock:
+        yield from async_connect(sock, address, timeout=5)
+        message = f"hello {num}".encode() * 100
+        yield from async_sendall(sock, message, timeout=5)
+        sock.shutdown(socket.SHUT_WR)
+        received = b""
+        while data := (yield from async_recv(sock, 4096, timeout=5)):
+            received += data
+        return received == message
+
+
+def test_many_sockets_on_one_thread(server):
+    clients = 200
+    address = server.getsockname()
+
+    results = wait(
+        _serve(server, clients), *[_client(address, num) for num in range(clients)]
+    )
+
+    assert results.count(True) == clients
+
+
+def test_wait_readable_timeout():
+    left, right = socket.socketpair()
+    with left, right:
+        start = time()
+        with pytest.raises(TimeoutError):
+            wait(wait_readable(left, timeout=0.05))
+        elapsed_time = time() - start
+
+        right.send(b"x")
+        assert wait(wait_readable(left, timeout=1)) == [None]
+
+    assert 0.05 <= elapsed_time < 0.2
+
+
+def test_select_is_woken_by_timers_and_futures():
+    left, right = socket.socketpair()
+    future: Future = Future()
+    Timer(0.05, future.set_result, args=[1]).start()
+
+    def _reader():
+        yield from wait_readable(left)
+        return left.recv(1)
+
+    def _writer():
+        yield from async_sleep(0.02)
+        value = yield from async_result(future)
+        right.send(b"%d" % value)
+        return value
+
+    with left, right:
+        start = time()
+        results = wait(_reader(), _writer())
+        elapsed_time = time() - start
+
+    assert sorted(results, key=str) == [1, b"1"]
+    assert elapsed_time < 0.5
+
+
+def test_connect_refused(server):
+    address = server.getsockname()
+    server.close()
+
+    with socket.socket() as sock, pytest.raises(OSError):
+        wait(async_connect(sock, address, timeout=1))
+
+
+def test_cancelled_reader_is_unregistered():
+    left, right = socket.socketpair()
+    loop = Loop()
+    task = loop.spawn(wait_readable(left))
+    loop.run_ready()
+
+    loop.cancel(task, TimeoutError())
+    loop.run_ready()
+    right.send(b"x")
+    another = loop.spawn(wait_readable(left))
+    while loop:
+        loop.run_ready()
+        loop.park()
+    loop.close()
+    left.close()
+    right.close()
+
+    assert isinstance(task.exc, TimeoutError)
+    assert another.done and another.exc is None
+
+
+def test_tasks_wait_for_the_same_file():
+    left, right = socket.socketpair()
+
+    def _reader(num: int):
+        yield from wait_readable(left, timeout=1)
+        return num
+
+    with left, right:
+        right.send(b"x")
+        results = wait(_reader(1), _reader(2))
+
+    assert sorted(results) == [1, 2]
@@ -0,0 +1,74 @@
+from concurrent.futures import Future
+from threading import Timer
+from time import time
+
+import pytest
+
+from sprint2.aiotools import Loop, Wait, async_result, async_sleep, wait
+
+
+def _resolve_later(seconds: float, future: Future, value: int) -> None:
+    Timer(seconds, future.set_result, args=(value,)).start()
+
+
+def test_wait_for_future_from_another_thread():
+    future: Future = Future()
+    _resolve_later(0.02, future, 42)
+
+    start = time()
+    results = wait(async_result(future))
+    elapsed_time = time() - start
+
+    assert results == [42]
+    assert 0.02 <= elapsed_time < 0.1
+
+
+def test_wait_for_future_timeout():
+    future: Future = Future()
+
+    start = time()
+    with pytest.raises(TimeoutError):
+        wait(async_result(future, timeout=0.01))
+
+    assert 0.01 <= time() - start < 0.05
+
+
+def test_parked_tasks_are_not_stepped():
+    steps = 0
+    future: Future = Future()
+
+    def waiter():
+        nonlocal steps
+        while not future.done():
+            steps += 1
+            yield Wait(future)
+        return future.result()
+
+    def resolver():
+        yield from async_sleep(0.02)
+        future.set_result("done")
+
+    loop = Loop()
+    task = loop.spawn(waiter())
+    loop.spawn(resolver())
+    while loop:
+        loop.run_ready()
+        loop.park()
+
+    assert task.result() == "done"
+    assert steps == 1
+
+
+def test_cancel_throws_into_a_parked_task():
+    future: Future = Future()
+    loop = Loop()
+    task = loop.spawn(async_result(future))
+    loop.run_ready()
+
+    loop.cancel(task, TimeoutError("cancelled"))
+    [finished] = loop.run_ready()
+
+    assert finished is task
+    assert isinstance(task.exc, TimeoutError)
+    future.set_result(1)  # the stale wakeup is ignored
+    assert not loop.run_ready()
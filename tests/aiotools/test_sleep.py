@@ -0,0 +1,34 @@
+from time import process_time, time
+
+from sprint2.aiotools import Sleep, async_sleep, gather, wait
+
+
+def _count_steps(seconds: float):
+    steps = 0
+    for trap in async_sleep(seconds):
+        assert isinstance(trap, Sleep)
+        steps += 1
+    return steps
+
+
+def sleeper(seconds: float, retval: int):
+    yield from async_sleep(seconds)
+    return retval
+
+
+def test_sleep_returns_seconds():
+    assert wait(async_sleep(0.01)) == [0.01]
+
+
+def test_sleep_yields_at_least_once():
+    assert _count_steps(0) == 1
+
+
+def test_sleep_does_not_spin():
+    start, cpu_start = time(), process_time()
+    results = gather(*[sleeper(0.2, num) for num in range(100)])
+    elapsed, cpu_time = time() - start, process_time() - cpu_start
+
+    assert results == list(range(100))
+    assert 0.2 <= elapsed < 0.3
+    assert cpu_time < 0.1
@@ -0,0 +1,19 @@
+from sprint2.aiotools import TimerHeap
+
+
+def test_timer_heap_order():
+    timers: TimerHeap[str] = TimerHeap()
+    timers.push(3.0, "c")
+    timers.push(1.0, "a")
+    timers.push(2.0, "b1")
+    timers.push(2.0, "b2")
+
+    assert len(timers) == 4
+    assert timers.earliest() == 1.0
+
+    assert timers.pop_due(0.5) == []
+    assert timers.pop_due(2.0) == ["a", "b1", "b2"]
+    assert timers.earliest() == 3.0
+    assert timers.pop_due(10.0) == ["c"]
+    assert timers.earliest() is None
+    assert not len(timers)
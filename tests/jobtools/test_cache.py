@@ -0,0 +1,134 @@
+from threading import Event, Lock, Timer
+from time import sleep
+
+import pytest
+
+from sprint2.aiotools import wait
+from sprint2.jobtools import Job, ResultCache, async_run_job
+from sprint2.jobtools.job import JobError
+
+
+class _Calls:
+    def __init__(self) -> None:
+        self.count = 0
+        self._lock = Lock()
+
+    def add(self) -> None:
+        with self._lock:
+            self.count += 1
+
+
+CALLS = _Calls()
+RELEASED = Event()
+
+
+def _square(num: int) -> int:
+    CALLS.add()
+    return num * num
+
+
+def _slow_square(num: int) -> int:
+    RELEASED.wait(2)
+    return _square(num)
+
+
+def _fail(num: int) -> int:
+    CALLS.add()
+    raise ValueError(num)
+
+
+@pytest.fixture(autouse=True)
+def _reset_calls():
+    CALLS.count = 0
+    RELEASED.clear()
+
+
+def test_job_run_is_memoized():
+    cache = ResultCache()
+
+    assert [Job(fn=_square, args=[3], cache=cache).run() for _ in range(3)] == [9] * 3
+    assert Job(fn=_square, args=[4], cache=cache).run() == 16
+    assert CALLS.count == 2
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert Job(fn=lambda: 1, cache=cache).run() == 1  # not cacheable
+    assert len(cache) == 2
+
+
+def test_cache_key_is_stable():
+    key = ResultCache.key_for(_square, (3,), {"a": 1, "b": 2})
+
+    assert key == ResultCache.key_for(_square, (3,), {"b": 2, "a": 1})
+    assert key != ResultCache.key_for(_square, (4,), {"a": 1, "b": 2})
+    assert ResultCache.key_for(_square, (Lock(),), {}) is None
+
+
+def test_cache_lru_and_size_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+    cache = ResultCache(max_bytes=200)
+    cache.put("a", b"x" * 100)
+    cache.put("b", b"y" * 100)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == b"y" * 100
+
+
+def test_cache_ttl():
+    cache = ResultCache(ttl=0.05)
+    cache.put("a", 1)
+
+    assert cache.get("a") == 1
+    sleep(0.1)
+    assert cache.get("a", "expired") == "expired"
+    assert not len(cache)
+
+
+def test_cache_disk_tier(tmp_path):
+    cache = ResultCache(max_entries=1, path=tmp_path)
+    Job(fn=_square, args=[2], cache=cache).run()
+    Job(fn=_square, args=[3], cache=cache).run()
+
+    another = ResultCache(path=tmp_path)  # as if in a next process
+    assert Job(fn=_square, args=[2], cache=another).run() == 4
+    assert Job(fn=_square, args=[3], cache=cache).run() == 9
+    assert CALLS.count == 2
+
+    another.clear()
+    assert not list(tmp_path.iterdir())
+
+
+def test_cache_coalesces_in_flight_jobs():
+    cache = ResultCache()
+    jobs = [Job(fn=_slow_square, args=[5], executor="thread", cache=cache)] * 5
+
+    Timer(0.1, RELEASED.set).start()
+    results = wait(*[async_run_job(job) for job in jobs])
+
+    assert results == [25] * 5
+    assert CALLS.count == 1
+    assert cache.hits == 0
+
+
+def test_cache_does_not_keep_failures():
+    cache = ResultCache()
+    jobs = [Job(fn=_fail, args=[1], cache=cache) for _ in range(2)]
+
+    for job in jobs:
+        with pytest.raises(JobError):
+            wait(async_run_job(job))
+
+    assert CALLS.count == 2
+    assert not len(cache)
+
+
+def test_invalid_cache():
+    with pytest.raises(JobError):
+        Job(fn=_square, cache={})
+    with pytest.raises(ValueError):
+        ResultCache(max_entries=0)
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+import pickle
+
+import pytest
+
+from sprint2.jobtools import CancelToken
+from sprint2.jobtools.job import JobCancelledError, JobExpiredError
+
+
+def test_token_without_deadline():
+    token = CancelToken()
+
+    assert not token.cancelled
+    assert token.remaining() is None
+    token.raise_if_cancelled()
+
+    token.cancel()
+
+    assert token.cancelled
+    with pytest.raises(JobCancelledError):
+        token.raise_if_cancelled()
+
+
+def test_token_expires_at_its_deadline():
+    token = CancelToken(datetime.now() - timedelta(seconds=1))
+
+    assert token.cancelled
+    assert token.remaining() == 0
+    with pytest.raises(JobExpiredError):
+        token.raise_if_cancelled()
+
+
+def test_token_keeps_its_deadline_in_a_copy():
+    deadline = datetime.now() + timedelta(seconds=10)
+
+    token = pickle.loads(pickle.dumps(CancelToken(deadline)))
+
+    assert token.deadline == deadline
+    assert 9 < token.remaining() <= 10
@@ -4,7 +4,8 @@ from typing import Any
 from freezegun import freeze_time
 import pytest
 
-from sprint2.jobtools.job import Job
+from sprint2.jobtools import ResultCache, RetryPolicy
+from sprint2.jobtools.job import Job, JobError, JobExecutor
 from sprint2.aiotools import wait, async_sleep
 
 
@@ -92,8 +93,14 @@ def test_job_equality_operator(job1: Job, job2: Job, answer: bool):
                 "args": (),
                 "kwargs": {},
                 "max_retries": 0,
+                "retry": None,
                 "start": None,
                 "duration": None,
+                "executor": "inline",
+                "priority": 0,
+                "by_deadline": False,
+                "cancellable": False,
+                "cache": None,
                 "dependencies": [],
             },
         ),
@@ -112,16 +119,28 @@ def test_job_equality_operator(job1: Job, job2: Job, answer: bool):
                 "args": (1, "2"),
                 "kwargs": {"a": 7, "b": [4]},
                 "max_retries": 0,
+                "retry": None,
                 "start": PAST,
                 "duration": 1,
+                "executor": "inline",
+                "priority": 0,
+                "by_deadline": False,
+                "cancellable": False,
+                "cache": None,
                 "dependencies": [
                     {
                         "fn": _Functor,
                         "args": (),
                         "kwargs": {},
                         "max_retries": 0,
+                        "retry": None,
                         "start": None,
                         "duration": None,
+                        "executor": "inline",
+                        "priority": 0,
+                        "by_deadline": False,
+                        "cancellable": False,
+                        "cache": None,
                         "dependencies": [],
                     },
                 ],
@@ -153,24 +172,42 @@ def test_job_equality_operator(job1: Job, job2: Job, answer: bool):
                 "args": (1, "2"),
                 "kwargs": {"a": 7, "b": [4]},
                 "max_retries": 0,
+                "retry": None,
                 "start": PAST,
                 "duration": 1,
+                "executor": "inline",
+                "priority": 0,
+                "by_deadline": False,
+                "cancellable": False,
+                "cache": None,
                 "dependencies": [
                     {
                         "fn": _Functor,
                         "args": (),
                         "kwargs": {},
                         "max_retries": 0,
+                        "retry": None,
                         "start": FUTURE,
                         "duration": 0,
+                        "executor": "inline",
+                        "priority": 0,
+                        "by_deadline": False,
+                        "cancellable": False,
+                        "cache": None,
                         "dependencies": [
                             {
                                 "fn": _foo,
                                 "args": (),
                                 "kwargs": {},
                                 "max_retries": 0,
+                                "retry": None,
                                 "start": None,
                                 "duration": 1,
+                                "executor": "inline",
+                                "priority": 0,
+                                "by_deadline": False,
+                                "cancellable": False,
+                                "cache": None,
                                 "dependencies": [],
                             },
                             {
@@ -178,8 +215,14 @@ def test_job_equality_operator(job1: Job, job2: Job, answer: bool):
                                 "args": (),
                                 "kwargs": {},
                                 "max_retries": 0,
+                                "retry": None,
                                 "start": None,
                                 "duration": 0,
+                                "executor": "inline",
+                                "priority": 0,
+                                "by_deadline": False,
+                                "cancellable": False,
+                                "cache": None,
                                 "dependencies": [],
                             },
                         ],
@@ -189,8 +232,14 @@ def test_job_equality_operator(job1: Job, job2: Job, answer: bool):
                         "args": (),
                         "kwargs": {},
                         "max_retries": 0,
+                        "retry": None,
                         "start": NOW,
                         "duration": None,
+                        "executor": "inline",
+                        "priority": 0,
+                        "by_deadline": False,
+                        "cancellable": False,
+                        "cache": None,
                         "dependencies": [],
                     },
                 ],
@@ -292,6 +341,15 @@ def test_is_expired(job: Job, answer: bool):
         assert job.is_expired() == answer
 
 
+def test_deadline_anchored_at_start():
+    job = Job(fn=_foo, duration=SECOND)
+
+    with freeze_time(NOW):
+        assert job.get_deadline(started=PAST) == NOW
+        assert job.is_expired(started=PAST - timedelta(seconds=SECOND))
+        assert not job.is_expired(started=PAST)
+
+
 # def test_job_gen_dependencies():
 #     job_dep1 = Job(fn=_foo, start=NOW, duration=None)
 #     job_dep2 = Job(fn=_foo, start=PAST, duration=None)
@@ -332,3 +390,73 @@ def test_is_expired(job: Job, answer: bool):
 
 #     # assert res == [3, 2, 1]
 #     print(res)
+
+
+def test_job_executor():
+    assert Job(fn=_foo).executor is JobExecutor.INLINE
+    assert Job(fn=_foo, executor="thread").executor is JobExecutor.THREAD
+
+    with pytest.raises(JobError):
+        Job(fn=_foo, executor="fiber")
+
+
+def test_job_key():
+    assert Job(fn=_foo, args=[1]).key == Job(fn=_foo, args=(1,)).key
+    assert Job(fn=_foo).key != Job(fn=_foo, args=[1]).key
+    assert Job(fn=_foo).key != Job(fn=_foo, start=NOW).key
+    retry = RetryPolicy(backoff=0.5)
+    assert Job(fn=_foo, retry=retry).key == Job(fn=_foo, retry=retry).key
+    assert Job(fn=_foo).key != Job(fn=_foo, retry=retry).key
+    assert Job(fn=_foo).key != Job(fn=_foo, cache=ResultCache()).key
+    assert Job(fn=_foo).key != Job(fn=_foo, by_deadline=True).key
+
+    unhashable = Job(fn=_foo, kwargs={"b": [4]})
+    assert unhashable.key == unhashable.key
+    assert unhashable.key != Job(fn=_foo, kwargs={"b": [4]}).key
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"fn": 1},
+        {"fn": _foo, "args": 1},
+        {"fn": _foo, "kwargs": {1: 2}},
+        {"fn": _foo, "max_retries": -1},
+        {"fn": _foo, "duration": "1"},
+        {"fn": _foo, "start": "2024-01-01"},
+        {"fn": _foo, "priority": 1.5},
+        {"fn": _foo, "retry": 1},
+        {"fn": _foo, "dependencies": [_foo]},
+    ],
+)
+def test_job_validation(params: dict[str, Any]):
+    with pytest.raises(JobError):
+        Job(**params)
+
+
+def test_job_bulk():
+    dep = Job(fn=_foo)
+
+    jobs = Job.bulk(_Functor(), [(1,), (2, 3)], kwargs={"a": 1}, dependencies=[dep])
+
+    assert [job.args for job in jobs] == [(1,), (2, 3)]
+    assert jobs[0].kwargs == {"a": 1} and jobs[0].kwargs is not jobs[1].kwargs
+    assert jobs[0].dependencies == [dep]
+    assert jobs[0].id != jobs[1].id
+    assert jobs[0] == Job(
+        fn=jobs[1].func, args=[1], kwargs={"a": 1}, dependencies=[dep]
+    )
+    with pytest.raises(JobError):
+        Job.bulk(_foo, [()], max_retries=-1)
+
+
+def test_job_equality_of_deep_chains():
+    def chain(depth: int) -> Job:
+        job = Job(fn=_foo)
+        for num in range(depth):
+            job = Job(fn=_foo, args=[num], dependencies=[job])
+        return job
+
+    assert chain(5000) == chain(5000)
+    assert chain(5000) != chain(4999)
+    assert Job(fn=_foo) != _foo
@@ -0,0 +1,93 @@
+from threading import Timer
+
+import pytest
+
+from sprint2.jobtools import queue as queue_module
+from sprint2.jobtools.queue import Capacity, ReadyQueue
+
+
+def _drain(queue: ReadyQueue) -> list:
+    return [queue.pop() for _ in range(len(queue))]
+
+
+def test_ready_queue_priority_and_fifo():
+    queue: ReadyQueue[str] = ReadyQueue()
+    queue.push("bulk1")
+    queue.push("urgent1", priority=10)
+    queue.push("bulk2")
+    queue.push("low", priority=-1)
+    queue.push("urgent2", priority=10)
+
+    assert _drain(queue) == ["urgent1", "urgent2", "bulk1", "bulk2", "low"]
+
+    with pytest.raises(IndexError):
+        queue.pop()
+
+
+def test_ready_queue_deadlines_within_level():
+    queue: ReadyQueue[str] = ReadyQueue()
+    queue.push("fifo")
+    queue.push("late", deadline=20.0)
+    queue.push("early", deadline=10.0)
+    queue.push("urgent", priority=1)
+
+    assert _drain(queue) == ["urgent", "early", "late", "fifo"]
+
+
+def test_ready_queue_aging(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(queue_module, "monotonic", lambda: now[0])
+    queue: ReadyQueue[str] = ReadyQueue(aging=1.0)
+
+    queue.push("old low", priority=0)
+    now[0] = 5.0
+    queue.push("new high", priority=3)
+    queue.push("new higher", priority=6)
+
+    assert _drain(queue) == ["new higher", "old low", "new high"]
+
+    queue.push("fifo")
+    now[0] = 5.5  # the same aging period
+    queue.push("early", deadline=1.0)
+    assert _drain(queue) == ["early", "fifo"]
+
+
+def test_ready_queue_invalid_aging():
+    with pytest.raises(ValueError):
+        ReadyQueue(aging=0)
+
+
+def test_capacity_limit_and_watermarks():
+    marks = []
+    capacity = Capacity(
+        3,
+        watermarks=(1, 2),
+        on_high=lambda: marks.append("high"),
+        on_low=lambda: marks.append("low"),
+    )
+
+    assert capacity.reserve(2)
+    assert not capacity.reserve(2, block=False)
+    assert not capacity.reserve(2, timeout=0.05)
+    assert capacity.reserve(1, block=False)
+    capacity.release(1)
+    assert marks == ["high"]
+    capacity.release(1)
+    capacity.release(1)
+    assert marks == ["high", "low"]
+    assert len(capacity) == 0
+
+
+def test_capacity_blocks_until_released():
+    capacity = Capacity(1)
+    capacity.reserve(1)
+    Timer(0.05, capacity.release, args=[1]).start()
+
+    assert capacity.reserve(1, timeout=2)
+    assert len(capacity) == 1
+
+
+@pytest.mark.parametrize("limit, watermarks", [(0, None), (None, (2, 2))])
+def test_capacity_invalid(limit, watermarks):
+    with pytest.raises(ValueError):
+        Capacity(limit, watermarks)
@@ -0,0 +1,89 @@
+from time import process_time, time
+
+import pytest
+
+from sprint2.aiotools import wait
+from sprint2.jobtools import Job, RetryPolicy, async_run_job
+from sprint2.jobtools.job import JobError, JobExpiredError
+
+
+class _Flaky:
+    def __init__(self, failures: int, exc_type: type[Exception] = ValueError):
+        self.calls = 0
+        self._failures = failures
+        self._exc_type = exc_type
+
+    def __call__(self) -> int:
+        self.calls += 1
+        if self.calls <= self._failures:
+            raise self._exc_type(f"the call {self.calls} failed")
+        return self.calls
+
+
+def test_retry_policy_delays():
+    policy = RetryPolicy(backoff=0.1, factor=3, max_delay=0.5)
+
+    delays = [policy.get_delay(attempt) for attempt in range(1, 5)]
+
+    assert delays == pytest.approx([0.1, 0.3, 0.5, 0.5])
+
+
+def test_retry_policy_jitter():
+    policy = RetryPolicy(backoff=1, factor=1, jitter=0.5)
+
+    assert all(0.5 <= policy.get_delay(1) <= 1 for _ in range(100))
+
+
+@pytest.mark.parametrize(
+    ("failures", "max_retries", "calls", "raises"),
+    [
+        (0, 0, 1, False),
+        (2, 2, 3, False),
+        (2, 1, 2, True),
+        (1, 0, 1, True),
+    ],
+)
+def test_retries_count(failures: int, max_retries: int, calls: int, raises: bool):
+    fn = _Flaky(failures)
+    job = Job(fn=fn, max_retries=max_retries)
+
+    if raises:
+        with pytest.raises(JobError):
+            wait(async_run_job(job))
+    else:
+        assert wait(async_run_job(job)) == [calls]
+    assert fn.calls == calls
+
+
+def test_retries_back_off_on_timers():
+    fn = _Flaky(2)
+    job = Job(fn=fn, max_retries=2, retry=RetryPolicy(backoff=0.05, factor=2))
+
+    start, cpu_start = time(), process_time()
+    results = wait(async_run_job(job))
+    elapsed_time, cpu_time = time() - start, process_time() - cpu_start
+
+    assert results == [3]
+    assert 0.15 <= elapsed_time < 0.25
+    assert cpu_time < 0.1
+
+
+def test_retries_filter_exceptions():
+    fn = _Flaky(1, exc_type=KeyError)
+    job = Job(fn=fn, max_retries=3, retry=RetryPolicy(retry_on=(ValueError,)))
+
+    with pytest.raises(JobError):
+        wait(async_run_job(job))
+    assert fn.calls == 1
+
+
+def test_retries_count_against_duration():
+    fn = _Flaky(1)
+    job = Job(fn=fn, max_retries=1, duration=1, retry=RetryPolicy(backoff=5))
+
+    start = time()
+    with pytest.raises(JobExpiredError):
+        wait(async_run_job(job))
+
+    assert time() - start < 0.5
+    assert fn.calls == 1
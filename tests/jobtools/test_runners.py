@@ -1,10 +1,12 @@
 from datetime import datetime, timedelta
-from time import sleep
+from multiprocessing import active_children
+from threading import Event
+from time import sleep, time
 
 import pytest
 
-from sprint2.aiotools import wait
-from sprint2.jobtools.job import Job
+from sprint2.aiotools import async_sleep, coroutine, wait
+from sprint2.jobtools.job import Job, JobError, JobExpiredError
 from sprint2.jobtools.runners import async_run_job
 
 
@@ -24,7 +26,7 @@ def test_run_job():
     job1 = Job(
         fn=_fn,
         args=(1, 2),
-        start=NOW + timedelta(seconds=2),
+        start=datetime.now() + timedelta(seconds=2),
         dependencies=[Job(fn=_fn, kwargs={"a": "b"})],
     )
     job2 = Job(fn=_fn, args=[1], dependencies=[Job(fn=_fn, kwargs={"c": "d"})])
@@ -39,10 +41,143 @@ def test_run_job_child_timeouted():
     job1 = Job(
         fn=_fn,
         args=(1, 2),
-        start=NOW + timedelta(seconds=2),
+        start=datetime.now() + timedelta(seconds=2),
         dependencies=[Job(fn=_fn, kwargs={"a": "b"}, duration=0)],
     )
     job_runners = [async_run_job(job1)]
 
     with pytest.raises(TimeoutError):
         wait(*job_runners)
+
+
+def test_run_job_in_thread():
+    job = Job(fn=_fn, args=(1, 2, 3), executor="thread")
+
+    results = wait(async_run_job(job))
+
+    assert results == [3]
+
+
+def test_run_job_in_thread_timeouted():
+    job = Job(fn=sleep, args=(3,), duration=1, executor="thread")
+
+    start = datetime.now()
+    with pytest.raises(TimeoutError):
+        wait(async_run_job(job))
+
+    assert datetime.now() - start < timedelta(seconds=2)
+
+
+def _spin(*args, **kwargs):
+    while True:
+        pass
+
+
+def _fail(*args, **kwargs):
+    raise ValueError(args)
+
+
+def test_run_job_in_process():
+    job = Job(fn=_fn, args=(1, 2), kwargs={"a": "b"}, executor="process")
+
+    results = wait(async_run_job(job))
+
+    assert results == [3]
+
+
+def test_run_job_in_process_failed():
+    job = Job(fn=_fail, args=(1,), executor="process")
+
+    with pytest.raises(JobError):
+        wait(async_run_job(job))
+
+
+class _UnpicklableError(Exception):
+    def __init__(self, a, b):
+        super().__init__(f"{a} {b}")  # unpickled with one argument
+
+
+def _fail_unpicklable(*args, **kwargs):
+    raise _UnpicklableError(1, 2)
+
+
+def test_run_job_in_process_failed_unpicklable():
+    job = Job(fn=_fail_unpicklable, executor="process")
+
+    with pytest.raises(JobError):
+        wait(async_run_job(job))
+    assert not active_children()
+
+
+def test_run_job_in_process_terminated():
+    job = Job(fn=_spin, duration=1, executor="process")
+
+    start = datetime.now()
+    with pytest.raises(TimeoutError):
+        wait(async_run_job(job))
+    sleep(0.1)
+
+    assert datetime.now() - start < timedelta(seconds=2)
+    assert not active_children()
+
+
+def test_run_job_duration_counts_from_start():
+    job = Job(fn=sleep, args=(1.2,), duration=1)
+
+    with pytest.raises(JobExpiredError):
+        wait(async_run_job(job))
+
+
+def test_run_job_in_thread_is_asked_to_stop():
+    stopped = Event()
+
+    def _poll(cancel_token):
+        while not cancel_token.cancelled:
+            sleep(0.01)
+        stopped.set()
+
+    job = Job(fn=_poll, duration=1, executor="thread", cancellable=True)
+
+    start = datetime.now()
+    with pytest.raises(JobExpiredError):
+        wait(async_run_job(job))
+
+    assert stopped.wait(timeout=0.5)
+    assert datetime.now() - start < timedelta(seconds=1.5)
+
+
+def _ticker(ticks: int, seconds: float):
+    for _ in range(ticks):
+        yield from async_sleep(seconds)
+    return ticks
+
+
+@coroutine
+def _forever():
+    while True:
+        yield from async_sleep(0.01)
+
+
+def test_run_generator_jobs_interleaved():
+    jobs = [Job(fn=_ticker, args=[10, 0.01]) for _ in range(20)]
+
+    start = time()
+    results = wait(*[async_run_job(job) for job in jobs])
+    elapsed_time = time() - start
+
+    assert results == [10] * 20
+    assert elapsed_time < 0.5
+    assert Job(fn=_ticker, args=[2, 0]).run() == 2
+
+
+def test_run_generator_job_expires_at_yield():
+    start = time()
+    with pytest.raises(JobExpiredError):
+        wait(async_run_job(Job(fn=_forever, duration=1)))
+
+    assert 1 <= time() - start < 1.5
+
+
+def test_generator_job_runs_inline():
+    with pytest.raises(JobError):
+        Job(fn=_forever, executor="thread")
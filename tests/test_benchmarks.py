@@ -0,0 +1,14 @@
+import json
+
+from benchmarks.bench import SCENARIOS, main
+
+
+def test_benchmarks_smoke(tmp_path):
+    out = tmp_path / "results.json"
+
+    main(["--scale", "0.005", "--repeat", "1", "--out", str(out)])
+    report = json.loads(out.read_text())
+    main(["--scale", "0.005", "--repeat", "1", "--compare", str(out)])
+
+    assert [r["name"] for r in report["results"]] == [s.name for s in SCENARIOS]
+    assert all(r["jobs_per_s"] > 0 for r in report["results"])
@@ -0,0 +1,145 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from sprint2.jobtools import Job, RetryPolicy
+from sprint2.journal import Journal, JournalOp
+from sprint2.scheduler import Scheduler, SchedulerError
+
+
+NOW = datetime.now()
+
+
+def _fn(*args, **kwargs):
+    return len(args) + len(kwargs)
+
+
+def _flaky(*args, **kwargs):
+    raise ValueError("flaky")
+
+
+def test_journal_restores_pending_jobs(tmp_path):
+    sched = Scheduler(pool_size=2, journal=Journal(tmp_path))
+    sched.push(Job(fn=_fn, args=[1], start=NOW))
+    sched.push(Job(fn=_fn, args=[1, 2], dependencies=[Job(fn=_fn, kwargs={"a": 1})]))
+    sched.push(Job(fn=_fn, args=[1, 2, 3]))
+    sched.shutdown()
+
+    restored = Scheduler(pool_size=3, journal=Journal(tmp_path))
+
+    assert len(restored) == 3
+    assert restored.run() == [1, 2, 3]
+    restored.shutdown()
+
+    assert not len(Scheduler(journal=Journal(tmp_path)))
+
+
+def test_journal_replays_log_tail_after_crash(tmp_path):
+    journal = Journal(tmp_path, snapshot_every=3)
+    sched = Scheduler(pool_size=1, journal=journal)
+    for num in range(4):
+        sched.push(Job(fn=_fn, args=[num] * num))
+    assert sched.run() == [0, 1, 2, 3]
+    for num in range(4, 7):
+        sched.push(Job(fn=_fn, args=[num] * num))
+    # no shutdown: the scheduler has crashed, a torn record is left behind
+    with (tmp_path / Journal.LOG_NAME).open("a") as f:
+        f.write('{"op": "finished", "se')
+
+    restored = Scheduler(pool_size=2, journal=Journal(tmp_path))
+
+    assert len(restored) == 3
+    assert restored.run() == [4, 5, 6]
+
+
+def test_journal_recovers_twice_after_torn_tail(tmp_path):
+    sched = Scheduler(journal=Journal(tmp_path))
+    sched.push(Job(fn=_fn, args=[1]))
+    with (tmp_path / Journal.LOG_NAME).open("a") as f:
+        f.write('{"op": "pushed", "se')
+
+    # crash, recover, push more and crash again
+    restored = Scheduler(journal=Journal(tmp_path))
+    restored.push(Job(fn=_fn, args=[1, 2]))
+    restored.push(Job(fn=_fn, args=[1, 2, 3]))
+
+    again = Scheduler(pool_size=3, journal=Journal(tmp_path))
+
+    assert len(again) == 3
+    assert again.run() == [1, 2, 3]
+    again.shutdown()
+
+
+def _read_ops(path) -> list[str]:
+    with (path / Journal.LOG_NAME).open() as f:
+        return [json.loads(line)["op"] for line in f]
+
+
+def test_journal_records_transitions(tmp_path):
+    sched = Scheduler(pool_size=2, journal=Journal(tmp_path))
+    sched.push(Job(fn=_fn))
+    sched.push(Job(fn=_fn, args=[1]))
+    sched.pop()
+    sched.push(Job(fn=_flaky))
+
+    sched.run()
+
+    ops = _read_ops(tmp_path)
+    assert ops[:6] == [
+        JournalOp.PUSHED,
+        JournalOp.PUSHED,
+        JournalOp.POPPED,
+        JournalOp.PUSHED,
+        JournalOp.STARTED,
+        JournalOp.STARTED,
+    ]
+    assert sorted(ops[6:]) == [JournalOp.FAILED, JournalOp.FINISHED]
+    sched.shutdown()
+    assert _read_ops(tmp_path) == []  # compacted into the snapshot
+
+
+def test_journal_rejects_unimportable_functions(tmp_path):
+    sched = Scheduler(journal=Journal(tmp_path))
+
+    with pytest.raises(SchedulerError):
+        sched.push(Job(fn=lambda: 1))
+    with pytest.raises(SchedulerError):
+        sched.push(Job(fn=_fn, args=[object()]))
+
+
+def test_journal_keeps_retry_policies(tmp_path):
+    policy = RetryPolicy(backoff=0.5, max_delay=2, retry_on=(ValueError, OSError))
+    sched = Scheduler(journal=Journal(tmp_path))
+    sched.push(Job(fn=_fn, max_retries=3, retry=policy))
+    sched.shutdown()
+
+    [(_, job)] = Journal(tmp_path).pending()
+
+    assert job.retry == policy
+
+
+def test_journal_deducts_the_retries_made(tmp_path):
+    journal = Journal(tmp_path)
+    sched = Scheduler(journal=journal)
+    sched.push(Job(fn=_fn, max_retries=3))
+    [(seq, _)] = journal.pending()
+    journal.append(JournalOp.RETRIED, seq)  # as if retried before a crash
+    journal.append(JournalOp.RETRIED, seq)
+    sched.shutdown()
+
+    [(_, job)] = Journal(tmp_path).pending()
+
+    assert job.max_retries == 1
+
+
+def test_journal_forgets_cancelled_jobs(tmp_path):
+    sched = Scheduler(journal=Journal(tmp_path))
+    kept, cancelled = Job(fn=_fn, args=[1]), Job(fn=_fn, args=[1, 2])
+    sched.push_many([kept, cancelled])
+    sched.cancel(cancelled.id)
+    sched.shutdown()
+
+    [(_, job)] = Journal(tmp_path).pending()
+
+    assert job == kept
@@ -0,0 +1,43 @@
+import logging
+from threading import current_thread
+
+from sprint2.aiotools import wait
+from sprint2.jobtools import Job, async_run_job
+from sprint2.logger import sched_logger, setup_logging
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[tuple[str, str]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append((current_thread().name, record.getMessage()))
+
+
+def test_job_str_is_short():
+    job = Job(fn=len, args=["a"])
+    for _ in range(30):  # the repr of the chain is exponential
+        job = Job(fn=len, args=["a"], dependencies=[job, job])
+
+    assert str(job) == f"Job#{job.id}<len>"
+
+
+def test_logs_go_through_the_listener():
+    handler, root_handler = _ListHandler(), _ListHandler()
+    logging.getLogger().addHandler(root_handler)
+    listener = setup_logging(logging.INFO, handler)
+    job = Job(fn=len, args=["abc"])
+
+    try:
+        wait(async_run_job(job))
+    finally:
+        listener.stop()
+        sched_logger.setLevel(logging.NOTSET)
+        logging.getLogger().removeHandler(root_handler)
+
+    assert handler.records == [
+        ("sprint2-logging", f"{job}: finished with the result 3"),
+    ]
+    assert not root_handler.records  # not written twice
+    assert sched_logger.propagate
@@ -0,0 +1,46 @@
+import pytest
+
+from sprint2.metrics import Histogram, MetricsExporter, MetricsRegistry
+
+
+def test_histogram_summary():
+    hist = Histogram(bounds=(0.1, 1, 10))
+    for value in (0.05, 0.5, 0.5, 5):
+        hist.observe(value)
+
+    summary = hist.summary()
+
+    assert summary["count"] == 4
+    assert summary["mean"] == pytest.approx(1.5125)
+    assert summary["p50"] == 1
+    assert summary["p99"] == summary["max"] == 5
+    assert hist.buckets == [1, 2, 1, 0]
+
+
+def test_registry_snapshot_and_text():
+    registry = MetricsRegistry(prefix="x_")
+    registry.counter("hits").inc(3)
+    registry.gauge("depth", lambda: 7)
+    registry.histogram("lat").observe(0.001)
+
+    snapshot = registry.snapshot()
+    text = registry.to_text()
+
+    assert snapshot["counters"] == {"x_hits": 3}
+    assert snapshot["gauges"] == {"x_depth": 7}
+    assert snapshot["histograms"]["x_lat"]["count"] == 1
+    assert "# TYPE x_hits counter\nx_hits 3\n" in text
+    assert 'x_lat_bucket{le="+Inf"} 1\n' in text
+
+
+def test_exporter_dumps_to_file(tmp_path):
+    registry = MetricsRegistry()
+    counter = registry.counter("hits")
+    path = tmp_path / "metrics.prom"
+    exporter = MetricsExporter(registry, path, interval=0.01)
+
+    exporter.start()
+    counter.inc()
+    exporter.stop()
+
+    assert "hits 1\n" in path.read_text()
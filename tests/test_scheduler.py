@@ -1,10 +1,13 @@
 from datetime import datetime, timedelta
-from time import sleep
+from threading import Event, Lock, Thread, Timer
+from time import sleep, time
 
 import pytest
 
+from sprint2.aiotools import async_sleep
 from sprint2.jobtools import Job
-from sprint2.scheduler import Scheduler, SchedulerError
+from sprint2.jobtools.job import JobError, JobExpiredError
+from sprint2.scheduler import JobTaskStatus, Scheduler, SchedulerError
 
 
 NOW = datetime.now()
@@ -17,6 +20,10 @@ def _fn(*args, **kwargs):
     return result
 
 
+def _fail(*args, **kwargs):
+    raise ValueError(args)
+
+
 @pytest.fixture()
 def sched1() -> Scheduler:
     sched = Scheduler(pool_size=1)
@@ -95,3 +102,566 @@ def test_sched_add_pop_with_runs():
     res = sched.run()
     assert not len(sched)
     assert res == [3]
+
+
+def test_sched_run_with_dependencies():
+    sched = Scheduler(pool_size=2)
+
+    failing = Job(fn=_fn, duration=0)
+    sched.push(Job(fn=_fn, args=[1], dependencies=[Job(fn=_fn, args=[2])]))
+    sched.push(Job(fn=_fn, dependencies=[failing]))
+
+    res = sched.run()
+
+    assert res[0] == 1
+    assert isinstance(res[1], TimeoutError)
+
+
+def _blocking_fn(seconds: float, num: int) -> float:
+    sleep(seconds)
+    return seconds
+
+
+def test_sched_thread_executor_runs_in_parallel():
+    sched = Scheduler(pool_size=4)
+    for num in range(4):
+        sched.push(Job(fn=_blocking_fn, args=[0.1, num], executor="thread"))
+
+    start = time()
+    res = sched.run()
+    elapsed_time = time() - start
+    sched.shutdown()
+
+    assert res == [0.1] * 4
+    assert elapsed_time < 0.3
+
+
+class _Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        if kwargs.get("fail"):
+            raise ValueError("the dependency has failed")
+        return self.calls
+
+
+def test_sched_shared_dependency_runs_once():
+    counter = _Counter()
+    sched = Scheduler(pool_size=3)
+
+    shared = Job(fn=counter)
+    sched.push(Job(fn=_fn, args=[1], dependencies=[shared]))
+    sched.push(Job(fn=_fn, args=[1, 2], dependencies=[shared]))
+    sched.push(Job(fn=_fn, dependencies=[Job(fn=counter)]))  # equal to shared
+
+    res = sched.run()
+
+    assert res == [1, 2, 0]
+    assert counter.calls == 1
+
+
+def test_sched_equal_pushed_jobs_run_each():
+    counter = _Counter()
+    sched = Scheduler(pool_size=3)
+
+    sched.push_many(Job(fn=counter) for _ in range(3))
+    sched.push(Job(fn=_fn, dependencies=[Job(fn=counter)]))
+
+    assert sorted(sched.run()[:3]) == [1, 2, 3]
+    assert counter.calls == 4  # a dependency does not join a pushed job
+
+
+def test_sched_shared_dependency_failure_fans_out():
+    counter = _Counter()
+    sched = Scheduler(pool_size=2)
+
+    shared = Job(fn=counter, kwargs={"fail": True})
+    sched.push(Job(fn=_fn, dependencies=[shared]))
+    sched.push(Job(fn=_fn, dependencies=[shared]))
+
+    res = sched.run()
+
+    assert all(isinstance(r, JobError) for r in res)
+    assert counter.calls == 1
+
+
+def test_sched_deep_diamonds_run_linearly():
+    counter = _Counter()
+    sched = Scheduler(pool_size=1)
+
+    job = Job(fn=counter, args=[0])
+    for level in range(1, 30):
+        left = Job(fn=counter, args=[level, "left"], dependencies=[job])
+        right = Job(fn=counter, args=[level, "right"], dependencies=[job])
+        job = Job(fn=counter, args=[level], dependencies=[left, right])
+    sched.push(job)
+
+    sched.run()
+
+    assert counter.calls == 1 + 29 * 3
+
+
+def test_sched_runs_dependencies_in_topological_order():
+    order: list[str] = []
+    sched = Scheduler(pool_size=2)
+
+    extract = Job(fn=order.append, args=["extract"])
+    transform = Job(fn=order.append, args=["transform"], dependencies=[extract])
+    load = Job(fn=order.append, args=["load"], dependencies=[transform])
+    sched.push(load)
+    sched.push(Job(fn=order.append, args=["report"], dependencies=[load, extract]))
+
+    sched.run()
+
+    assert order == ["extract", "transform", "load", "report"]
+
+
+def test_sched_pop_releases_unneeded_dependencies():
+    counter = _Counter()
+    sched = Scheduler(pool_size=2)
+
+    shared = Job(fn=counter, args=["shared"])
+    popped = Job(fn=counter, dependencies=[shared, Job(fn=counter, args=["own"])])
+    sched.push(popped)
+    sched.push(Job(fn=_fn, dependencies=[shared]))
+
+    assert sched.pop() is popped
+    res = sched.run()
+
+    assert res == [0]
+    assert counter.calls == 1
+
+
+class _Gauge:
+    def __init__(self):
+        self.current = self.peak = 0
+        self._lock = Lock()
+
+    def __call__(self, seconds: float, num: int) -> float:
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+        sleep(seconds)
+        with self._lock:
+            self.current -= 1
+        return seconds
+
+
+def test_sched_refills_free_slots():
+    gauge = _Gauge()
+    sched = Scheduler(pool_size=2)
+    for num in range(6):
+        sched.push(Job(fn=gauge, args=[0.05, num], executor="thread"))
+
+    start = time()
+    res = sched.run()
+    elapsed_time = time() - start
+    sched.shutdown()
+
+    assert res == [0.05] * 6
+    assert gauge.peak == 2
+    assert 0.15 <= elapsed_time < 0.25
+    assert not len(sched)
+
+
+def test_sched_runs_forever_until_stopped():
+    gauge = _Gauge()
+    sched = Scheduler(pool_size=2)
+    service = Thread(target=sched.run, kwargs={"forever": True})
+    service.start()
+
+    for num in range(4):
+        sched.push(Job(fn=gauge, args=[0.01, num], executor="thread"))
+    sleep(0.2)
+
+    assert not len(sched)
+    assert service.is_alive()
+
+    sched.stop()
+    service.join(timeout=1)
+    sched.shutdown()
+
+    assert not service.is_alive()
+
+
+def test_sched_starts_higher_priority_first():
+    order: list[str] = []
+    sched = Scheduler(pool_size=1)
+
+    for num in range(3):
+        sched.push(Job(fn=order.append, args=[f"bulk{num}"]))
+    dep = Job(fn=order.append, args=["dep"])
+    sched.push(Job(fn=order.append, args=["urgent"], priority=5, dependencies=[dep]))
+
+    sched.run()
+
+    assert order == ["dep", "urgent", "bulk0", "bulk1", "bulk2"]
+
+
+def _stubborn(num, cancel_token):
+    while not cancel_token.cancelled:
+        sleep(0.01)
+    return num
+
+
+def test_sched_expired_job_frees_its_slot():
+    sched = Scheduler(pool_size=1)
+    sched.push(
+        Job(fn=_stubborn, args=[1], duration=1, executor="thread", cancellable=True)
+    )
+    sched.push(Job(fn=_fn, args=[2], executor="thread"))
+
+    start = time()
+    expired, res = sched.run()
+    elapsed_time = time() - start
+    sched.shutdown()
+
+    assert isinstance(expired, JobExpiredError)
+    assert res == 1
+    assert elapsed_time < 1.5
+
+
+def test_sched_stats():
+    sched = Scheduler(pool_size=2)
+    dep = Job(fn=_fn, args=[0])
+    sched.push(Job(fn=_fn, args=[1], dependencies=[dep]))
+    sched.push(Job(fn=_fail, max_retries=1))
+
+    sched.run()
+    stats = sched.stats()
+    sched.shutdown()
+
+    assert stats["counters"] == {
+        "sched_jobs_pushed": 2,
+        "sched_jobs_started": 3,
+        "sched_jobs_finished": 2,
+        "sched_jobs_failed": 1,
+        "sched_jobs_retried": 1,
+        "sched_jobs_cancelled": 0,
+        "sched_jobs_dropped": 0,
+        "sched_jobs_expired": 0,
+    }
+    assert stats["gauges"]["sched_running_nodes"] == 0
+    assert stats["gauges"]["sched_unfinished_jobs"] == 0
+    assert stats["histograms"]["sched_run_seconds"]["count"] == 3
+    assert stats["histograms"]["sched_step_seconds"]["count"] > 0
+
+
+def _log(finished: list, name: str) -> None:
+    finished.append((name, time()))
+
+
+def test_sched_delayed_job_does_not_hold_a_slot():
+    sched = Scheduler(pool_size=1)
+    finished: list = []
+    later = datetime.now() + timedelta(seconds=0.3)
+    sched.push(Job(fn=_log, args=[finished, "delayed"], start=later))
+    sched.push(Job(fn=_log, args=[finished, "now"]))
+
+    start = time()
+    sched.run()
+
+    assert [name for name, _ in finished] == ["now", "delayed"]
+    assert finished[0][1] - start < 0.1
+    assert finished[1][1] - start >= 0.25
+    assert not sched.stats()["gauges"]["sched_ready_nodes"]
+
+
+def test_sched_finished_jobs_leave_the_deadlines():
+    sched = Scheduler(pool_size=4)
+    sched.push_many(Job(fn=_fn, duration=3600) for _ in range(200))
+
+    assert sched.run() == [0] * 200
+    assert len(sched._deadlines) < 50
+
+
+def test_sched_push_many():
+    sched = Scheduler(pool_size=2)
+
+    sched.push_many(Job(fn=_fn, args=[0] * num) for num in range(5))
+    with pytest.raises(SchedulerError):
+        sched.push_many([Job(fn=_fn), _fn])
+
+    assert len(sched) == 5
+    assert sched.run() == [0, 1, 2, 3, 4]
+    assert sched.stats()["counters"]["sched_jobs_pushed"] == 5
+
+
+def test_sched_job_pushed_twice_before_admission():
+    sched = Scheduler(pool_size=1, max_jobs=2, overflow="raise")
+    job = Job(fn=_fn)
+
+    sched.push(job)  # still in the inbox
+    with pytest.raises(SchedulerError):
+        sched.push(job)
+    sched.push(Job(fn=_fn, args=[0]))  # the room is not leaked
+
+    gauges = sched.stats()["gauges"]
+    assert (gauges["sched_pending_jobs"], gauges["sched_ready_nodes"]) == (2, 2)
+    assert sched.run() == [0, 1]
+    sched.push(job)  # collected, it may be pushed again
+    assert sched.run() == [0]
+
+
+def _square(num):
+    if num < 0:
+        raise ValueError(num)
+    return num * num
+
+
+def test_sched_map_chunks_the_calls():
+    sched = Scheduler(pool_size=2)
+
+    results = sched.map(_square, ((num,) for num in range(10)), chunksize=4)
+
+    assert len(sched) == 3
+    assert list(results) == [num * num for num in range(10)]
+    assert len(sched) == 0  # the yielded chunks are forgotten
+    assert sched.run() == []
+    assert not sched._nodes
+
+
+def test_sched_map_streams_from_a_running_service():
+    sched = Scheduler(pool_size=2)
+    service = Thread(target=sched.run, kwargs={"forever": True})
+    service.start()
+
+    try:
+        results = sched.map(_square, [(1,), (2,), (3,)], executor="thread")
+        assert list(results) == [1, 4, 9]
+        with pytest.raises(SchedulerError):
+            sched.run()
+    finally:
+        sched.stop()
+        service.join(timeout=1)
+        sched.shutdown()
+
+
+def test_sched_map_fits_a_bounded_scheduler():
+    sched = Scheduler(pool_size=2, max_jobs=4)
+
+    results = sched.map(_square, ((num,) for num in range(5)))
+    assert list(results) == [num * num for num in range(5)]
+
+    sched.push_many(Job(fn=_fn) for _ in range(3))
+    results = sched.map(_square, [(1,), (2,)])  # the blocking policy
+    assert list(results) == [1, 4]
+    assert sched.run() == [0, 0, 0]
+    sched.shutdown()
+
+
+def test_sched_map_raises_the_failure():
+    sched = Scheduler(pool_size=1)
+
+    results = sched.map(_square, [(1,), (-1,), (2,)])
+
+    assert next(results) == 1
+    with pytest.raises(JobError):
+        next(results)
+    with pytest.raises(SchedulerError):
+        sched.map(_square, [(1,)], chunksize=0)
+
+
+def test_sched_iter_results_as_jobs_finish():
+    sched = Scheduler(pool_size=3)
+    slow = Job(fn=sleep, args=[0.05], executor="thread")
+    fast = Job(fn=_fn, args=[1], executor="thread")
+    failing = Job(fn=_fail, args=[2])
+    sched.push_many([slow, fast, failing])
+
+    done = []
+    for job, res in sched.iter_results():
+        done.append((job, res))
+        assert len(sched) == 3 - len(done)
+
+    assert [job for job, _ in done] == [failing, fast, slow]
+    assert isinstance(done[0][1], JobError)
+    assert [res for _, res in done[1:]] == [1, None]
+    assert sched.run() == []
+    sched.shutdown()
+
+
+def test_sched_cancel_and_status():
+    sched = Scheduler(pool_size=1)
+    dep = Job(fn=_fn, args=["dep"])
+    cancelled = Job(fn=_fn, args=[1], dependencies=[dep])
+    kept = Job(fn=_fn, args=[1, 2])
+    sched.push_many([cancelled, kept])
+
+    assert sched.status(cancelled.id) is JobTaskStatus.CREATED
+    assert sched.cancel(cancelled.id)
+    assert not sched.cancel(cancelled.id)
+    assert sched.status(cancelled.id) is JobTaskStatus.CANCELLED
+    assert sched.status(dep.id) is None  # never pushed
+    assert len(sched) == 1
+    with pytest.raises(SchedulerError):
+        sched.push_many([kept])
+
+    assert sched.run() == [2]
+    assert sched.stats()["counters"]["sched_jobs_started"] == 1
+    sched.shutdown()
+
+
+def test_sched_cancels_running_job():
+    stopped = Event()
+
+    def _poll(cancel_token):
+        while not cancel_token.cancelled:
+            sleep(0.01)
+        stopped.set()
+
+    sched = Scheduler(pool_size=1)
+    job = Job(fn=_poll, executor="thread", cancellable=True)
+    sched.push_many([job, Job(fn=_fn, args=[1])])
+    results = sched.iter_results()
+    Timer(0.05, sched.cancel, args=(job.id,)).start()
+
+    [(done, res)] = list(results)
+
+    assert done.args == (1,) and res == 1
+    assert stopped.wait(timeout=0.5)
+    assert not len(sched)
+    sched.shutdown()
+
+
+def test_sched_cancel_is_constant_time():
+    sched = Scheduler(pool_size=1)
+    jobs = Job.bulk(_fn, ((num,) for num in range(20_000)))
+    sched.push_many(jobs)
+
+    start = time()
+    for job in reversed(jobs):
+        sched.cancel(job.id)
+    elapsed_time = time() - start
+
+    assert not len(sched)
+    assert elapsed_time < 1
+    assert sched.status(jobs[-1].id) is None  # the oldest tombstones go
+    assert sched.status(jobs[0].id) is JobTaskStatus.CANCELLED
+    assert not sched.stats()["gauges"]["sched_ready_nodes"]
+    assert len(sched._roots) < 100
+
+
+def test_sched_admits_jobs_from_many_producers():
+    counter = _Counter()
+    sched = Scheduler(pool_size=4)
+    service = Thread(target=sched.run, kwargs={"forever": True})
+    service.start()
+
+    def _produce(producer: int) -> None:
+        for num in range(100):
+            sched.push(Job(fn=counter, args=[producer, num]))
+
+    producers = [Thread(target=_produce, args=[num]) for num in range(50)]
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join()
+    deadline = time() + 2
+    while counter.calls < 5000 and time() < deadline:
+        sleep(0.01)
+    sched.stop()
+    service.join(timeout=1)
+    sched.shutdown()
+
+    assert counter.calls == 5000
+    assert not len(sched)
+
+
+def test_sched_bounded_raise():
+    sched = Scheduler(pool_size=1, max_jobs=2, overflow="raise")
+    sched.push_many(Job(fn=_fn, args=[0] * num) for num in range(2))
+
+    with pytest.raises(SchedulerError):
+        sched.push(Job(fn=_fn, args=[0, 0]))
+    with pytest.raises(SchedulerError):
+        Scheduler(max_jobs=2, overflow="other")
+
+    assert sched.run() == [0, 1]
+    sched.push(Job(fn=_fn, args=[0, 0]))
+    assert sched.run() == [2]
+    sched.shutdown()
+
+
+def test_sched_bounded_block_until_finished():
+    sched = Scheduler(pool_size=1, max_jobs=1, push_timeout=0.05)
+    sched.push(Job(fn=_fn))
+
+    with pytest.raises(SchedulerError):
+        sched.push(Job(fn=_fn, args=[0]))
+    sched.shutdown()
+
+    sched = Scheduler(pool_size=1, max_jobs=1, push_timeout=2)
+    sched.push(Job(fn=_fn))
+    service = Thread(target=sched.run, kwargs={"forever": True})
+    service.start()
+    sched.push(Job(fn=_fn, args=[0]))
+    deadline = time() + 2
+    while len(sched) and time() < deadline:
+        sleep(0.01)
+    sched.stop()
+    service.join(timeout=1)
+    sched.shutdown()
+
+    assert not len(sched)
+
+
+def test_sched_bounded_drop_oldest():
+    sched = Scheduler(pool_size=1, max_jobs=2, overflow="drop_oldest")
+    sched.push_many(Job(fn=_fn, args=[0] * num) for num in range(4))
+
+    assert sched.run() == [2, 3]
+    assert sched.stats()["counters"]["sched_jobs_dropped"] == 2
+    sched.shutdown()
+
+
+def test_sched_bounded_drop_lowest():
+    marks = []
+    sched = Scheduler(
+        pool_size=1,
+        max_jobs=2,
+        overflow="drop_lowest",
+        watermarks=(0, 2),
+        on_high_watermark=lambda: marks.append("high"),
+        on_low_watermark=lambda: marks.append("low"),
+    )
+    sched.push(Job(fn=_fn, args=[], priority=-1))
+    sched.push(Job(fn=_fn, args=[0]))
+    sched.push(Job(fn=_fn, args=[0, 0], priority=5))
+    sched.push(Job(fn=_fn, args=[0, 0, 0]))  # not above the queued ones
+
+    assert sched.run() == [1, 2]
+    assert marks == ["high", "low"]
+    sched.shutdown()
+
+
+def test_sched_drop_lowest_heap_stays_bounded():
+    sched = Scheduler(pool_size=4, max_jobs=100, overflow="drop_lowest")
+    for _ in range(50):
+        sched.push_many(Job(fn=_fn) for _ in range(50))
+        assert sched.run() == [0] * 50
+
+    assert len(sched._by_priority) < 200
+    sched.shutdown()
+
+
+def _napper(seconds: float):
+    yield from async_sleep(seconds)
+    return seconds
+
+
+def test_sched_generator_jobs_share_the_loop():
+    sched = Scheduler(pool_size=20)
+    sched.push_many(Job(fn=_napper, args=[0.1 + num / 1000]) for num in range(19))
+    sched.push(Job(fn=_napper, args=[5], duration=1))
+
+    start = time()
+    results = sched.run()
+    elapsed_time = time() - start
+    sched.shutdown()
+
+    assert len([res for res in results if isinstance(res, float)]) == 19
+    assert isinstance(results[-1], JobExpiredError)
+    assert 1 <= elapsed_time < 1.5